@@ -0,0 +1,86 @@
+"""
+Compares the LAME speed profiles of transcoder.SPEED_PROFILES.
+
+Every profile encodes the same set of test clips; the benchmark reports the
+median wall time, the CPU seconds FFmpeg used and the size of the MP3. The
+default clips are generated once with FFmpeg's lavfi sources in the formats
+yt-dlp usually downloads (48 kHz Opus in WebM, 44.1 kHz AAC in M4A); pass
+--clip to benchmark your own files instead.
+
+Usage: python benchmarks/bench_encode_profiles.py [--seconds 240] [--runs 3] [--quality 192] [--clip FILE ...]
+"""
+import argparse
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcoder import SPEED_PROFILES, find_ffmpeg, lame_options, transcode_to_mp3
+
+# name, lavfi source, codec options, extension
+CLIPS = (
+    ("tone-opus", "sine=frequency=440:sample_rate=48000", ["-c:a", "libopus", "-b:a", "128k"], "webm"),
+    ("noise-opus", "anoisesrc=color=pink:sample_rate=48000:seed=1", ["-c:a", "libopus", "-b:a", "160k"], "webm"),
+    ("chirp-aac", "aevalsrc=sin(2*PI*(100+400*t)*t)|sin(2*PI*(200+300*t)*t):sample_rate=44100",
+     ["-c:a", "aac", "-b:a", "128k"], "m4a"),
+)
+
+
+def make_clips(folder, seconds):
+    """Generate the default test clips"""
+    paths = []
+    for name, source, codec, ext in CLIPS:
+        path = os.path.join(folder, f"{name}.{ext}")
+        subprocess.run([find_ffmpeg(), "-y", "-loglevel", "error", "-f", "lavfi", "-i", f"{source}:duration={seconds}",
+                        "-ac", "2"] + codec + [path], check=True)
+        paths.append(path)
+    return paths
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def encode(source, target, quality, profile):
+    """Encode once, return (wall seconds, CPU seconds)"""
+    cpu = children_cpu_seconds()
+    started = time.perf_counter()
+    transcode_to_mp3(source, quality, target_path=target, keep_source=True, profile=profile)
+    return time.perf_counter() - started, children_cpu_seconds() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=240, help="Length of the generated clips")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--quality", default="192", choices=["128", "192", "320"])
+    parser.add_argument("--clip", action="append", metavar="FILE", help="Benchmark this file (repeatable)")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_encode_")
+    try:
+        clips = args.clip or make_clips(folder, args.seconds)
+        for profile in SPEED_PROFILES:
+            print(f"{profile}: {' '.join(lame_options(args.quality, profile))}")
+        print()
+        print(f"{'clip':16} {'profile':9} {'wall ms':>9} {'cpu s':>7} {'size B':>10}")
+        for source in clips:
+            name = os.path.splitext(os.path.basename(source))[0]
+            for profile in SPEED_PROFILES:
+                target = os.path.join(folder, f"{name}-{profile}.mp3")
+                timings = [encode(source, target, args.quality, profile) for _ in range(args.runs)]
+                print(f"{name[:16]:16} {profile:9} {statistics.median(t[0] for t in timings) * 1000:9.1f} "
+                      f"{statistics.median(t[1] for t in timings):7.2f} {os.path.getsize(target):10d}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
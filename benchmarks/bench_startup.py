@@ -0,0 +1,90 @@
+"""
+Measures the cold start of the entry points with python -X importtime.
+
+Every entry point is imported in a fresh interpreter, once with the heavy
+dependencies deferred (default) and once with CONVERT2MP3_EAGER_IMPORTS=1.
+Reported are the median wall time of the interpreter, the summed import time
+and the slowest modules the entry point imports directly (last run).
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 5] [main server convert2mp3]
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ("main", "server", "convert2mp3")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(stderr, entry_point):
+    """Return (total self time in us, list of (cumulative us, module) imported directly by entry_point)"""
+    total = 0
+    children = []
+    direct = []
+    # importtime lists a module after everything it imported, one more space of indent per level
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total += int(self_us)
+        if len(indent) == 3:
+            children.append((int(cumulative_us), name))
+        elif len(indent) == 1:
+            if name == entry_point:
+                direct = children
+            children = []
+    return total, sorted(direct, reverse=True)
+
+
+def measure(entry_point, eager, folder):
+    env = dict(os.environ,
+               PYTHONPATH=REPO,
+               CONVERT2MP3_EAGER_IMPORTS='1' if eager else '0',
+               CONVERT2MP3_JOB_STORE='memory',
+               CONVERT2MP3_ARCHIVE_DB=os.path.join(folder, 'archive.db'),
+               CONVERT2MP3_OUTPUT_CACHE_MAX_MB='0')
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry_point}"],
+                            cwd=folder, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {entry_point} failed:\n{result.stderr.splitlines()[-1]}")
+    return (wall, *parse_importtime(result.stderr, entry_point))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("entry_points", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="Slowest direct imports to list")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        for entry_point in args.entry_points:
+            for eager in (False, True):
+                walls, totals = [], []
+                for _ in range(args.runs):
+                    wall, total, imports = measure(entry_point, eager, folder)
+                    walls.append(wall)
+                    totals.append(total)
+                mode = "eager" if eager else "lazy"
+                print(f"{entry_point:12} {mode:5}  wall {statistics.median(walls) * 1000:7.1f} ms  "
+                      f"imports {statistics.median(totals) / 1000:7.1f} ms")
+                for cumulative, name in imports[:args.top]:
+                    print(f"{'':20}{cumulative / 1000:7.1f} ms  {name}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
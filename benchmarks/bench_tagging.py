@@ -0,0 +1,95 @@
+"""
+Compares the ways a converted track gets its tags and cover.
+
+- three-write: transcode, then EasyID3 save, then a second save for the APIC
+  frame (the original download_audio_async / MyGUI.download_audio path)
+- mutagen: transcode, then tagging.write_tags in a single save
+- ffmpeg: transcode_to_mp3 writes tags and cover in the same FFmpeg run
+
+Usage: python benchmarks/bench_tagging.py [--seconds 240] [--runs 5]
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen.easyid3 import EasyID3
+from mutagen.id3 import APIC
+from mutagen.mp3 import MP3
+from PIL import Image
+
+from tagging import write_tags
+from transcoder import find_ffmpeg, transcode_to_mp3
+
+TAGS = {'artist': 'Benchmark Artist', 'album': 'Benchmark Album', 'title': 'Benchmark Title'}
+
+
+def make_source(folder, seconds):
+    """Generate an AAC test clip like the m4a files yt-dlp downloads"""
+    path = os.path.join(folder, "source.m4a")
+    subprocess.run([find_ffmpeg(), "-y", "-loglevel", "error", "-f", "lavfi",
+                    "-i", f"sine=frequency=440:duration={seconds}", "-c:a", "aac", "-b:a", "128k", path],
+                   check=True)
+    return path
+
+
+def make_cover():
+    buffer = io.BytesIO()
+    Image.new("RGB", (500, 500), (200, 80, 40)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def three_write(source, target, cover):
+    transcode_to_mp3(source, target_path=target, keep_source=True)
+    audio = EasyID3(target)
+    audio['artist'] = TAGS['artist']
+    audio['album'] = TAGS['album']
+    audio['title'] = TAGS['title']
+    audio.save()
+    audio = MP3(target)
+    audio.tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=cover))
+    audio.save()
+
+
+def mutagen_single(source, target, cover):
+    transcode_to_mp3(source, target_path=target, keep_source=True)
+    write_tags(target, TAGS['artist'], TAGS['album'], TAGS['title'], cover)
+
+
+def ffmpeg_embed(source, target, cover):
+    transcode_to_mp3(source, target_path=target, keep_source=True, tags=TAGS, cover=cover)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=240, help="Length of the test clip")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="bench_tagging_")
+    try:
+        source = make_source(folder, args.seconds)
+        cover = make_cover()
+        for name, func in (("three-write", three_write), ("mutagen", mutagen_single), ("ffmpeg", ffmpeg_embed)):
+            timings = []
+            for run in range(args.runs):
+                target = os.path.join(folder, f"{name}-{run}.mp3")
+                started = time.perf_counter()
+                func(source, target, cover)
+                timings.append(time.perf_counter() - started)
+            tags = MP3(target).tags
+            print(f"{name:12} median {statistics.median(timings) * 1000:8.1f} ms  "
+                  f"size {os.path.getsize(target):9d} B  cover {'yes' if tags.getall('APIC') else 'no'}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
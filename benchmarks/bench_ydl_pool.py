@@ -0,0 +1,65 @@
+"""
+Measures the per-job setup cost of YoutubeDL with and without the pool.
+
+For every job a YoutubeDL is set up with options like the ones of a GUI
+download strategy (player client, FFmpegExtractAudio post-processor, progress
+hook, per-job output template): once constructed and closed per job, once
+checked out of a YoutubeDLPool. Nothing is downloaded.
+
+Usage: python benchmarks/bench_ydl_pool.py [--jobs 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+
+from ydl_pool import YoutubeDLPool
+
+
+def job_options(index):
+    return {
+        'format': 'bestaudio/best',
+        'outtmpl': f'/tmp/bench_ydl_pool/{index}/%(title)s.%(ext)s',
+        'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}],
+        'progress_hooks': [lambda d: None],
+        'extractor_args': {'youtube': {'player_client': ['android']}},
+        'nocheckcertificate': True,
+        'quiet': True,
+    }
+
+
+def construct(index, pool):
+    with yt_dlp.YoutubeDL(job_options(index)) as ydl:
+        ydl.prepare_filename({'id': str(index), 'title': 'Benchmark', 'ext': 'm4a'})
+
+
+def pooled(index, pool):
+    with pool.checkout(job_options(index)) as ydl:
+        ydl.prepare_filename({'id': str(index), 'title': 'Benchmark', 'ext': 'm4a'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=50)
+    args = parser.parse_args()
+
+    pool = YoutubeDLPool()
+    for name, func in (("per-job", construct), ("pooled", pooled)):
+        timings = []
+        for index in range(args.jobs):
+            started = time.perf_counter()
+            func(index, pool)
+            timings.append(time.perf_counter() - started)
+        print(f"{name:8} median {statistics.median(timings) * 1000:8.2f} ms  "
+              f"first {timings[0] * 1000:8.2f} ms  total {sum(timings) * 1000:9.1f} ms")
+    print(f"pool stats: {pool.stats()}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cooperative cancellation of running jobs.
+
+A CancelToken is shared by everything that works on one job. yt-dlp checks it
+from its progress hook, which is called for every downloaded block, and aborts
+the transfer by raising DownloadCancelled; transcode_to_mp3 polls it and kills
+FFmpeg. The hook also records the temporary files yt-dlp writes, so they can
+be removed once the job has stopped.
+"""
+import glob
+import logging
+import os
+import threading
+
+from lazy_imports import lazy_import
+
+yt_dlp_utils = lazy_import('yt_dlp.utils')
+
+logger = logging.getLogger(__name__)
+
+# Suffixes of the files yt-dlp leaves behind for an interrupted download
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.temp')
+
+
+class CancelToken:
+    """Cancellation flag of one job plus the partial files it produced"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._files = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self):
+        """Same check as threading.Event, so the token can be passed wherever an event is expected"""
+        return self._event.is_set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise yt_dlp_utils.DownloadCancelled()
+
+    def track(self, path):
+        """Remember a file to delete if the job is cancelled"""
+        if path:
+            with self._lock:
+                self._files.add(path)
+
+    def untrack(self, path):
+        """Forget a file, e.g. once it became the finished output of the job"""
+        with self._lock:
+            self._files.discard(path)
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook that aborts the download once the token is cancelled"""
+        self.track(d.get('tmpfilename'))
+        if d.get('status') != 'finished':
+            self.track(d.get('filename'))
+        self.raise_if_cancelled()
+
+    def cleanup(self):
+        """Delete the partial and temporary files of the job"""
+        with self._lock:
+            files, self._files = self._files, set()
+        for path in files:
+            candidates = {path}
+            candidates.update(path + suffix for suffix in PARTIAL_SUFFIXES)
+            # Fragmented downloads (HLS/DASH) write one file per fragment
+            candidates.update(glob.glob(glob.escape(path) + '-Frag*'))
+            for candidate in candidates:
+                try:
+                    os.remove(candidate)
+                    logger.info(f"Removed partial file {candidate}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove partial file {candidate}: {e}")
@@ -78,7 +78,9 @@
                 button.textContent = '⏳ Konvertiere...';
                 
                 try {
-                    await convertToMP3(videoId);
+                    await convertToMP3(videoId, (status) => {
+                        button.textContent = `⏳ ${status.progress || 0}%`;
+                    });
                     button.textContent = '✅ Fertig!';
                     setTimeout(() => {
                         button.textContent = '🎵 Zu MP3';
@@ -100,7 +102,7 @@
         container.appendChild(button);
     }
 
-    async function convertToMP3(videoId) {
+    async function convertToMP3(videoId, onProgress) {
         const videoUrl = `https://www.youtube.com/watch?v=${videoId}`;
         
         // Hole Einstellungen aus Storage
@@ -140,6 +142,11 @@
         } else {
             throw new Error(result.error || 'Unbekannter Fehler');
         }
+
+        const status = await followProgress(settings.serverUrl, result.download_id, onProgress);
+        if (status.status !== 'completed') {
+            throw new Error(status.error || status.message || 'Konvertierung fehlgeschlagen');
+        }
     }
 
     function showNotification(message, details) {
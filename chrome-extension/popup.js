@@ -132,9 +132,16 @@ async function convertFromPopup() {
         const result = await response.json();
         
         if (result.success) {
+            document.getElementById('videoUrl').value = '';
+            // Fortschritt per Server-Sent Events statt /status abzufragen
+            const status = await followProgress(settings.serverUrl, result.download_id, (update) => {
+                convertBtn.textContent = `⏳ ${update.progress || 0}%`;
+            });
+            if (status.status !== 'completed') {
+                throw new Error(status.error || status.message || 'Konvertierung fehlgeschlagen');
+            }
             convertBtn.textContent = '✓ Erfolg!';
             convertBtn.style.background = '#4CAF50';
-            document.getElementById('videoUrl').value = '';
             
             setTimeout(() => {
                 convertBtn.textContent = 'Konvertieren';
@@ -151,5 +158,3 @@ async function convertFromPopup() {
         convertBtn.disabled = false;
     }
 }
-
-
@@ -0,0 +1,22 @@
+// Gemeinsamer Fortschritts-Helfer für Popup und Content Script
+// (im Manifest vor content.js und in popup.html vor popup.js eingebunden)
+
+// Folgt den Statusmeldungen eines Jobs über GET /events/<download_id> (Server-Sent Events),
+// bis der Job abgeschlossen, fehlgeschlagen oder abgebrochen ist
+function followProgress(serverUrl, downloadId, onUpdate) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${serverUrl}/events/${downloadId}`);
+        source.addEventListener('status', (event) => {
+            const status = JSON.parse(event.data);
+            onUpdate(status);
+            if (['completed', 'error', 'cancelled', 'not_found'].includes(status.status)) {
+                source.close();
+                resolve(status);
+            }
+        });
+        source.onerror = () => {
+            source.close();
+            reject(new Error('Verbindung zum Server verloren'));
+        };
+    });
+}
@@ -0,0 +1,145 @@
+"""
+Headless command line front end of the download engine.
+
+Converts video and playlist URLs to tagged MP3 files without a display, e.g.
+on a server or from cron:
+
+    python -m convert2mp3 URL... --jobs 2 --quality 192 -o ~/Music
+    python -m convert2mp3 -i urls.txt
+    cat urls.txt | python -m convert2mp3
+
+URL lists contain one URL per line; empty lines and lines starting with '#'
+are ignored. The exit code is 0 if every URL succeeded, 1 otherwise.
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cancellation import CancelToken
+from download_archive import DownloadArchive
+from engine import DownloadEngine, TAG_MODES
+from transcoder import DEFAULT_PROFILE, OUTPUT_FORMATS, SPEED_PROFILES
+import http_pool
+from ydl_pool import shared_pool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), ".convert2mp3", "archive.db")
+
+
+def read_urls(lines):
+    """Return the URLs of a URL list, skipping empty lines and comments"""
+    urls = []
+    for line in lines:
+        url = line.strip()
+        if url and not url.startswith('#'):
+            urls.append(url)
+    return urls
+
+
+def collect_urls(args):
+    """URLs from the command line, the --input files and stdin"""
+    urls = list(args.urls)
+    for path in args.input or []:
+        if path == '-':
+            urls.extend(read_urls(sys.stdin))
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                urls.extend(read_urls(f))
+    if not urls and not args.input and not sys.stdin.isatty():
+        urls.extend(read_urls(sys.stdin))
+    return urls
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="convert2mp3", description="Convert YouTube videos and playlists to MP3")
+    parser.add_argument("urls", nargs="*", metavar="URL", help="Video or playlist URLs")
+    parser.add_argument("-i", "--input", action="append", metavar="FILE",
+                        help="File with one URL per line, '-' for stdin (repeatable)")
+    parser.add_argument("-o", "--output", default=".", help="Destination folder (default: current folder)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="URLs converted at the same time (default: 2)")
+    parser.add_argument("--quality", default="192", choices=["128", "192", "320"])
+    parser.add_argument("--artist", default="Unknown")
+    parser.add_argument("--album", default="Unknown")
+    parser.add_argument("--tag-mode", default="mutagen", choices=TAG_MODES,
+                        help="Write tags after the conversion (mutagen) or during it (ffmpeg)")
+    parser.add_argument("--speed", default=DEFAULT_PROFILE, choices=list(SPEED_PROFILES),
+                        help=f"LAME encoder profile (default: {DEFAULT_PROFILE})")
+    parser.add_argument("--format", default="mp3", choices=OUTPUT_FORMATS,
+                        help="'original' keeps Opus/M4A audio in its codec instead of converting to MP3")
+    parser.add_argument("--playlist-concurrency", type=int, default=3, help="Playlist entries in flight per URL")
+    parser.add_argument("--fanout", action="store_true", help="List playlists completely before downloading")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="Download archive database")
+    parser.add_argument("--no-archive", action="store_true", help="Convert again even if already archived")
+    parser.add_argument("--cookies", metavar="FILE", help="Netscape cookie file, read once and shared by all downloads")
+    parser.add_argument("--socket-timeout", type=int, default=20, help="Seconds before a stalled connection fails")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s:%(levelname)s:%(message)s")
+
+    urls = collect_urls(args)
+    if not urls:
+        print("No URLs given", file=sys.stderr)
+        return 2
+
+    archive = None
+    if not args.no_archive:
+        os.makedirs(os.path.dirname(os.path.abspath(args.archive)), exist_ok=True)
+        archive = DownloadArchive(args.archive)
+    engine = DownloadEngine(
+        args.quality,
+        tag_mode=args.tag_mode,
+        speed_profile=args.speed,
+        output_format=args.format,
+        archive=archive,
+        concurrency=args.playlist_concurrency,
+        fanout=args.fanout
+    )
+    output_folder = os.path.abspath(os.path.expanduser(args.output))
+    tokens = {url: CancelToken() for url in urls}
+
+    extra = {}
+    if args.cookies:
+        extra['cookiefile'] = os.path.abspath(os.path.expanduser(args.cookies))
+
+    def convert(url):
+        return engine.run(url, output_folder, args.artist, args.album, cancel_token=tokens[url],
+                          quiet=not args.verbose, no_warnings=not args.verbose,
+                          socket_timeout=args.socket_timeout, **extra)
+
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="convert")
+    try:
+        futures = {pool.submit(convert, url): url for url in urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                files = future.result()
+                print(f"OK      {url} ({len(files)} file{'s' if len(files) != 1 else ''})")
+                for filename in files:
+                    logger.info(f"Wrote {filename}")
+            except Exception as e:
+                failed += 1
+                print(f"FAILED  {url}: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Cancelling...", file=sys.stderr)
+        for token in tokens.values():
+            token.cancel()
+        pool.shutdown(wait=True, cancel_futures=True)
+        return 130
+    pool.shutdown()
+    http_pool.log_stats()
+    logger.info(f"YoutubeDL pool: {shared_pool.stats()}")
+    print(f"{len(urls) - failed} of {len(urls)} URLs converted to {output_folder}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Shared cookie jars for Netscape cookie files.
+
+A cookie file is parsed once into a jar that every YoutubeDL instance using
+that file shares (see ydl_pool). Before a jar is handed out, the file's mtime
+is checked at most every CHECK_INTERVAL seconds. An edited or replaced file is
+reloaded into the same jar object, so instances that are already set up see
+the new cookies too. The jar is never written back to the file.
+"""
+import logging
+import os
+import threading
+import time
+
+from lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+yt_dlp_cookies = lazy_import('yt_dlp.cookies')
+
+# Seconds between two mtime checks of the same file
+CHECK_INTERVAL = 2.0
+
+
+class CookieFileError(Exception):
+    """The cookie file cannot be parsed"""
+
+
+class CookieFile:
+    """
+    One parsed cookie file.
+
+    :param path: Netscape cookie file (cookies.txt).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.jar = yt_dlp_cookies.YoutubeDLCookieJar(path)
+        self.loads = 0
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the jar, reloaded first if the file changed"""
+        with self._lock:
+            now = time.monotonic()
+            if self._mtime is not None and now - self._checked < CHECK_INTERVAL:
+                return self.jar
+            self._checked = now
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+            return self.jar
+
+    def _load(self):
+        fresh = yt_dlp_cookies.YoutubeDLCookieJar(self.path)
+        try:
+            fresh.load()
+        except Exception as e:
+            raise CookieFileError(f"Cannot read cookie file {self.path}: {e}") from e
+        # Swap the contents in place, the jar object is shared with live YoutubeDL instances
+        with self.jar._cookies_lock:
+            self.jar._cookies = fresh._cookies
+        self.loads += 1
+        logger.info(f"Loaded {len(self.jar)} cookies from {self.path}")
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def get_jar(path):
+    """
+    Return the shared jar of a cookie file.
+
+    :raises FileNotFoundError: If the file does not exist.
+    :raises CookieFileError: If the file is not a valid cookie file.
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    with _files_lock:
+        cookie_file = _files.get(path)
+        if cookie_file is None:
+            cookie_file = _files[path] = CookieFile(path)
+    return cookie_file.get()
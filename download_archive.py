@@ -0,0 +1,109 @@
+"""
+Persistent archive of converted videos.
+
+Every finished MP3 is recorded with its video ID, quality, path, checksum and
+time. The whole index is held in a dict, so checking a playlist entry costs
+one lookup before anything is extracted; SQLite only persists it. Re-running
+a playlist therefore only downloads entries that are new or whose file is gone.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadArchive:
+    """
+    Video ID -> converted file index.
+
+    :param path: SQLite database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            " video_id TEXT NOT NULL,"
+            " quality TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " checksum TEXT,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (video_id, quality))"
+        )
+        self._index = {
+            (video_id, quality): {'path': path, 'checksum': checksum, 'created': created}
+            for video_id, quality, path, checksum, created in self._conn.execute(
+                "SELECT video_id, quality, path, checksum, created FROM archive")
+        }
+
+    def lookup(self, video_id, quality, output_folder=None):
+        """
+        Return the archive entry of a video converted with this quality.
+
+        :param output_folder: Only return the entry if its file is in this folder.
+        :return: Dict with path, checksum and created, or None if the video is not
+            archived or its file no longer exists.
+        """
+        if not video_id:
+            return None
+        with self._lock:
+            entry = self._index.get((video_id, str(quality)))
+        if entry is None:
+            return None
+        if output_folder is not None and os.path.dirname(os.path.abspath(entry['path'])) != os.path.abspath(output_folder):
+            return None
+        if not os.path.exists(entry['path']):
+            return None
+        return dict(entry)
+
+    def add(self, video_id, quality, path):
+        """Record a finished file"""
+        if not video_id:
+            return
+        try:
+            checksum = file_checksum(path)
+        except OSError as e:
+            logger.warning(f"Could not archive {path}: {e}")
+            return
+        entry = {'path': os.path.abspath(path), 'checksum': checksum, 'created': time.time()}
+        with self._lock:
+            self._index[(video_id, str(quality))] = entry
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archive (video_id, quality, path, checksum, created) VALUES (?, ?, ?, ?, ?)",
+                (video_id, str(quality), entry['path'], entry['checksum'], entry['created'])
+            )
+
+    def ids_in(self, output_folder, quality):
+        """Return the set of video IDs converted with this quality whose file exists in output_folder"""
+        folder = os.path.abspath(output_folder)
+        with self._lock:
+            entries = [(video_id, entry['path']) for (video_id, q), entry in self._index.items() if q == str(quality)]
+        return {
+            video_id for video_id, path in entries
+            if os.path.dirname(path) == folder and os.path.exists(path)
+        }
+
+    def verify(self, video_id, quality):
+        """Return True if the archived file still matches its checksum"""
+        entry = self.lookup(video_id, quality)
+        return entry is not None and file_checksum(entry['path']) == entry['checksum']
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
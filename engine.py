@@ -0,0 +1,321 @@
+"""
+Download engine shared by the GUI, the server and the command line.
+
+Fetching the source audio with yt-dlp, converting it to MP3 (or copying the
+audio stream when no re-encode is needed), writing tags and cover art,
+recording the result in the download archive and streaming playlists through
+PlaylistPipeline happen here. The front ends only add their
+own progress reporting, retries and persistence on top.
+"""
+import logging
+import os
+
+from cancellation import CancelToken
+from info_cache import extract_info_cached
+from lazy_imports import lazy_import
+from playlist_pipeline import PlaylistPipeline, PipelineStage, HostLimiter, resolve_playlist, fan_out, entry_url
+from strategy_stats import strategy_key
+from tagging import write_tags
+from thumbnails import fetch_cover
+from transcoder import (DEFAULT_PROFILE, OUTPUT_FORMATS, SPEED_PROFILES, downloaded_filepath, plan_transcode,
+                        remux_audio, transcode_to_mp3)
+from ydl_pool import shared_pool
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import('yt_dlp')
+
+# 'mutagen': tags are written after the conversion, 'ffmpeg': in the same FFmpeg run
+TAG_MODES = ('mutagen', 'ffmpeg')
+
+# Maximum concurrent playlist downloads from the same host in fan-out mode
+PER_HOST_LIMIT = 4
+
+
+def fetch_thumbnail(info):
+    """Download and resize the thumbnail of a video in memory, returns JPEG data or None"""
+    try:
+        if info.get("thumbnail"):
+            return fetch_cover(info["thumbnail"])
+    except Exception as e:
+        logger.error(f"Failed to fetch thumbnail: {e}")
+    return None
+
+
+def source_options(output_folder, progress_hooks=(), **extra):
+    """
+    yt-dlp options that download the best audio source without post-processing.
+
+    :param output_folder: Folder the source file is written to.
+    :param progress_hooks: yt-dlp progress hooks.
+    :param extra: Further yt-dlp options, they override the defaults.
+    """
+    return {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),
+        'nocheckcertificate': True,
+        'progress_hooks': list(progress_hooks),
+        **extra
+    }
+
+
+class DownloadEngine:
+    """
+    Downloads videos and playlists and turns them into tagged MP3 files.
+
+    :param quality: MP3 bitrate in kbit/s.
+    :param tag_mode: One of TAG_MODES.
+    :param archive: Optional DownloadArchive; finished files are recorded there
+        and archived playlist entries are skipped.
+    :param concurrency: Number of playlist entries downloaded at the same time.
+    :param fanout: Flat-extract the whole playlist first and keep the downloads
+        busy while finished entries wait for FFmpeg.
+    :param download_slots: Semaphore or number bounding the downloads in fan-out
+        mode, defaults to concurrency. Pass a shared semaphore to bound several jobs.
+    :param host_limiter: HostLimiter used in fan-out mode.
+    :param transcode_workers: Number of parallel FFmpeg runs of a playlist.
+    :param run_transcode: Optional callable(func, *args, **kwargs) that runs the
+        FFmpeg calls of a playlist, e.g. JobScheduler.run_transcode.
+    :param ydl_pool: YoutubeDLPool the YoutubeDL instances are taken from.
+    :param speed_profile: LAME speed profile, a key of transcoder.SPEED_PROFILES.
+    :param output_format: One of transcoder.OUTPUT_FORMATS; 'original' keeps Opus/M4A
+        sources in their codec instead of converting them to MP3.
+    """
+
+    def __init__(self, quality="192", tag_mode='mutagen', archive=None, concurrency=3, fanout=False,
+                 download_slots=None, host_limiter=None, transcode_workers=None, run_transcode=None,
+                 ydl_pool=None, speed_profile=DEFAULT_PROFILE, output_format='mp3'):
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f"Unknown tag mode: {tag_mode}")
+        if speed_profile not in SPEED_PROFILES:
+            raise ValueError(f"Unknown speed profile: {speed_profile}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.quality = str(quality)
+        self.tag_mode = tag_mode
+        self.archive = archive
+        self.concurrency = max(1, concurrency)
+        self.fanout = fanout
+        self.download_slots = download_slots
+        self.host_limiter = host_limiter
+        self.transcode_workers = transcode_workers or os.cpu_count() or 1
+        self.run_transcode = run_transcode
+        self.ydl_pool = ydl_pool or shared_pool
+        self.speed_profile = speed_profile
+        self.output_format = output_format
+
+    def download(self, ydl, info):
+        """
+        Download the source audio of a resolved video.
+
+        :return: Tuple (info, source_path).
+        """
+        info = ydl.process_ie_result(info, download=True)
+        return info, downloaded_filepath(ydl, info)
+
+    def convert(self, info, source_path, artist, album, cancel_event=None):
+        """
+        Convert a downloaded source to MP3 with tags and cover, and archive it.
+
+        Runs FFmpeg on the calling thread.
+
+        :return: Path of the audio file.
+        """
+        cover = fetch_thumbnail(info)
+        if self.tag_mode == 'ffmpeg':
+            filename = self.transcode_tagged(source_path, info, artist, album, cover, cancel_event)
+        else:
+            filename = self.encode(info, source_path, cancel_event)
+            self.tag(filename, info, artist, album, cover)
+        self.add_to_archive(info, filename)
+        return filename
+
+    def encode(self, info, source_path, cancel_event=None, tags=None, cover=None):
+        """
+        Turn a downloaded source into the output file, copying the audio stream
+        instead of re-encoding whenever plan_transcode allows it.
+
+        :param info: Info dict of the downloaded format.
+        :param tags: Optional ID3 text tags FFmpeg writes into an MP3.
+        :param cover: Optional JPEG data FFmpeg embeds into an MP3.
+        :return: Path of the audio file.
+        """
+        action, extension = plan_transcode(info, self.quality, self.output_format)
+        logger.info(f"{action} {info.get('acodec')} @ {info.get('abr')} kbit/s -> {extension}: {source_path}")
+        if extension != 'mp3':
+            filename = remux_audio(source_path, extension, cancel_event=cancel_event)
+        else:
+            filename = transcode_to_mp3(source_path, self.quality, tags=tags, cover=cover, cancel_event=cancel_event,
+                                        profile=self.speed_profile, copy=action == 'copy')
+        if isinstance(cancel_event, CancelToken):
+            # A source copied in place is the finished file now, cancelling the job must not delete it
+            cancel_event.untrack(filename)
+        return filename
+
+    def transcode_tagged(self, source_path, info, artist, album, cover=None, cancel_event=None):
+        """Convert to MP3 and let FFmpeg write the tags and cover in the same pass"""
+        if plan_transcode(info, self.quality, self.output_format)[1] != 'mp3':
+            # Kept in its original container, where FFmpeg cannot always embed a cover
+            filename = self.encode(info, source_path, cancel_event)
+            self.tag(filename, info, artist, album, cover)
+            return filename
+        tags = {'artist': artist or "Unknown", 'album': album or "Unknown", 'title': info.get('title') or "Unknown Title"}
+        return self.encode(info, source_path, cancel_event, tags=tags, cover=cover)
+
+    def tag(self, filename, info, artist, album, cover=None):
+        """Write artist, album, title and the cover in a single save"""
+        write_tags(filename, artist or "Unknown", album or "Unknown", info.get('title') or "Unknown Title", cover)
+
+    def add_to_archive(self, info, filename):
+        if self.archive is not None:
+            self.archive.add(info.get('id'), self.quality, filename)
+
+    def run_playlist(self, entries, ydl_opts, output_folder, artist, album, cancel_token, total=None,
+                     skip=None, on_finished=None, on_entry_status=None):
+        """
+        Stream playlist entries through download -> transcode -> cover art -> tag,
+        or download -> cover art -> transcode with tags in 'ffmpeg' tag mode.
+
+        :param entries: Lazy iterator of playlist entries from resolve_playlist.
+        :param ydl_opts: yt-dlp options; post-processors and progress hooks are dropped.
+        :param cancel_token: CancelToken of the job; no new entries are started once it
+            is cancelled, and DownloadCancelled is raised at the end.
+        :param total: Number of entries, if known.
+        :param skip: Optional callable(item) returning True if an entry needs no download.
+            It may set item['filename'] to a file it provided.
+        :param on_finished: Optional callable(item) after an entry was converted and archived;
+            item holds 'info' and 'filename'.
+        :param on_entry_status: Optional callable(state, total) whenever an entry changes.
+        :return: List of entry status dicts.
+        :raises yt_dlp.DownloadError: If every entry failed.
+        """
+        # Concurrent entries would fight over a progress display, so only keep the cancel check
+        entry_opts = {key: value for key, value in ydl_opts.items()
+                      if key not in ('postprocessors', 'postprocessor_args', 'progress_hooks')}
+        entry_opts['noplaylist'] = True
+        entry_opts['progress_hooks'] = [cancel_token.progress_hook]
+        client = strategy_key(entry_opts)[1]
+
+        max_in_flight = self.concurrency
+        download_limit = None
+        host_limiter = None
+        transcode_limit = None
+        if self.fanout:
+            entries = fan_out(entries)
+            total = len(entries)
+            max_in_flight = self.concurrency + self.transcode_workers
+            download_limit = self.download_slots or self.concurrency
+            host_limiter = self.host_limiter or HostLimiter(PER_HOST_LIMIT)
+            if self.run_transcode is None:
+                transcode_limit = self.transcode_workers
+
+        def download(item):
+            entry = item['entry']
+            item['title'] = entry.get('title')
+            if self.archive is not None and self.archive.lookup(entry.get('id'), self.quality, output_folder):
+                # Converted by an earlier run, nothing to do
+                return
+            if skip is not None and skip(item):
+                return
+            with self.ydl_pool.checkout(entry_opts) as ydl:
+                info, item['source_path'] = self.download(ydl, extract_info_cached(ydl, entry_url(entry), client))
+                item['info'] = info
+                item['title'] = info.get('title', "Unknown Title")
+
+        def run_transcode(func, *args, **kwargs):
+            if self.run_transcode is not None:
+                return self.run_transcode(func, *args, **kwargs)
+            return func(*args, **kwargs)
+
+        def finished(item):
+            self.add_to_archive(item['info'], item['filename'])
+            if on_finished is not None:
+                on_finished(item)
+
+        def transcode(item):
+            if 'source_path' in item:
+                cancel_token.track(item['source_path'])
+                item['filename'] = run_transcode(self.encode, item['info'], item['source_path'], cancel_token)
+
+        def cover(item):
+            if 'source_path' in item:
+                item['cover'] = fetch_thumbnail(item['info'])
+
+        def tag(item):
+            if 'source_path' in item:
+                self.tag(item['filename'], item['info'], artist, album, item['cover'])
+                finished(item)
+
+        def transcode_with_tags(item):
+            if 'source_path' in item:
+                cancel_token.track(item['source_path'])
+                item['filename'] = run_transcode(self.transcode_tagged, item['source_path'], item['info'],
+                                                 artist, album, item['cover'], cancel_token)
+                finished(item)
+
+        if self.tag_mode == 'ffmpeg':
+            stages = [
+                PipelineStage('download', download, limit=download_limit, host_limiter=host_limiter),
+                PipelineStage('cover', cover),
+                PipelineStage('transcode', transcode_with_tags, limit=transcode_limit),
+            ]
+        else:
+            stages = [
+                PipelineStage('download', download, limit=download_limit, host_limiter=host_limiter),
+                PipelineStage('transcode', transcode, limit=transcode_limit),
+                PipelineStage('cover', cover),
+                PipelineStage('tag', tag),
+            ]
+        pipeline = PlaylistPipeline(
+            stages,
+            max_in_flight=max_in_flight,
+            on_entry_status=(lambda state: on_entry_status(state, total)) if on_entry_status else None,
+            should_cancel=cancel_token.is_set
+        )
+        states = pipeline.run(entries)
+        cancel_token.raise_if_cancelled()
+
+        failed = [state for state in states if state['status'] == 'error']
+        if failed and len(failed) == len(states):
+            raise yt_dlp.DownloadError(failed[0].get('error', 'All playlist entries failed'))
+        if failed:
+            logger.warning(f"{len(failed)} of {len(states)} playlist entries failed: "
+                           + ", ".join(str(state['title']) for state in failed))
+        return states
+
+    def run(self, url, output_folder, artist="Unknown", album="Unknown", cancel_token=None,
+            progress_hooks=(), on_entry_status=None, **ydl_extra):
+        """
+        Download a video or playlist URL into output_folder.
+
+        :param cancel_token: Optional CancelToken to stop the job.
+        :param progress_hooks: yt-dlp progress hooks for single videos.
+        :param on_entry_status: See run_playlist.
+        :param ydl_extra: Further yt-dlp options.
+        :return: List of the audio files written.
+        """
+        cancel_token = cancel_token or CancelToken()
+        os.makedirs(output_folder, exist_ok=True)
+        ydl_opts = source_options(output_folder, [cancel_token.progress_hook, *progress_hooks], **ydl_extra)
+        try:
+            with self.ydl_pool.checkout(ydl_opts) as ydl:
+                info, entries = resolve_playlist(ydl, url, strategy_key(ydl_opts)[1])
+                cancel_token.raise_if_cancelled()
+                if entries is not None:
+                    files = []
+                    states = self.run_playlist(entries, ydl_opts, output_folder, artist, album, cancel_token,
+                                               total=info.get('playlist_count'),
+                                               on_finished=lambda item: files.append(item['filename']),
+                                               on_entry_status=on_entry_status)
+                    logger.info(f"Playlist {url}: {len(files)} of {len(states)} entries converted")
+                    return files
+                archived = self.archive.lookup(info.get('id'), self.quality, output_folder) if self.archive else None
+                if archived:
+                    return [archived['path']]
+                info, source_path = self.download(ydl, info)
+            cancel_token.track(source_path)
+            return [self.convert(info, source_path, artist, album, cancel_event=cancel_token)]
+        except Exception:
+            if cancel_token.cancelled:
+                cancel_token.cleanup()
+            raise
@@ -0,0 +1,144 @@
+"""
+Hedged metadata extraction.
+
+Instead of trying download strategies one after another, the metadata
+extraction of the top-K strategies is started in parallel. The first one that
+returns a usable audio format wins. The others are stopped at their next HTTP
+request and their pooled YoutubeDL instances are returned right away. Only the
+winner goes on to download.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from info_cache import extract_info_cached, extraction_profile, shared_cache
+from lazy_imports import lazy_import
+from strategy_stats import strategy_key, video_id_from_url
+from ydl_pool import profile_key, shared_pool
+
+logger = logging.getLogger(__name__)
+
+yt_dlp_utils = lazy_import('yt_dlp.utils')
+
+# Options that only matter for the download itself, not for extraction
+DOWNLOAD_ONLY_OPTS = ('postprocessors', 'postprocessor_args', 'progress_hooks', 'outtmpl')
+
+
+def extraction_options(ydl_opts):
+    """Options of a strategy for a quiet extraction without download"""
+    opts = {key: value for key, value in ydl_opts.items() if key not in DOWNLOAD_ONLY_OPTS}
+    opts['quiet'] = True
+    opts.pop('verbose', None)
+    return opts
+
+
+def distinct_extractions(strategies, limit):
+    """
+    The best-ranked strategy of each distinct extraction, at most limit of them.
+
+    Strategies that differ only in their format or post-processing run the same
+    extraction, racing them against each other would gain nothing.
+    """
+    candidates = {}
+    for ydl_opts in strategies:
+        candidates.setdefault(profile_key(extraction_options(ydl_opts)), ydl_opts)
+        if len(candidates) >= limit:
+            break
+    return list(candidates.values())
+
+
+def has_usable_audio(info):
+    """Return True if an extracted video offers at least one format with audio"""
+    for fmt in info.get('formats') or []:
+        if fmt.get('acodec') not in (None, 'none') and (fmt.get('url') or fmt.get('manifest_url')):
+            return True
+    return False
+
+
+@contextmanager
+def stop_when_set(ydl, event):
+    """
+    Make every HTTP request of ydl raise DownloadCancelled once event is set.
+
+    Extractors request their pages through YoutubeDL.urlopen, so a losing
+    extraction stops at its next request instead of running to the end.
+    """
+    urlopen = ydl.urlopen
+
+    def checked_urlopen(req):
+        if event.is_set():
+            raise yt_dlp_utils.DownloadCancelled("Another extraction won the race")
+        return urlopen(req)
+
+    ydl.urlopen = checked_urlopen
+    try:
+        yield ydl
+    finally:
+        # Drop the instance attribute again before the instance goes back to the pool
+        del ydl.urlopen
+
+
+def race_extraction(video_url, strategies, top_k=3, on_failure=None):
+    """
+    Extract video_url with the top_k best strategies concurrently.
+
+    :param strategies: yt-dlp option dicts, best first.
+    :param top_k: Number of distinct extractions raced against each other; of
+        strategies sharing an extraction only the best-ranked one takes part.
+    :param on_failure: Optional callback (ydl_opts, error, latency) for losers
+        that failed, e.g. to feed StrategyStats.
+    :return: (ydl_opts, info) of the winner, or None if no strategy produced a
+        single video with usable audio (playlists are left to the normal path).
+    """
+    candidates = distinct_extractions(strategies, max(1, top_k))
+    done_event = threading.Event()
+
+    # A cached extraction wins without a race
+    video_id = video_id_from_url(video_url)
+    for ydl_opts in candidates if video_id else []:
+        info = shared_cache.get(video_id, strategy_key(ydl_opts)[1], extraction_profile(ydl_opts))
+        if info is not None and has_usable_audio(info):
+            logger.info(f"Hedged extraction served from info cache for {video_id}")
+            return ydl_opts, info
+
+    def extract(ydl_opts):
+        started = time.monotonic()
+        if done_event.is_set():
+            return ydl_opts, None, None, 0
+        try:
+            with shared_pool.checkout(extraction_options(ydl_opts)) as ydl:
+                with stop_when_set(ydl, done_event):
+                    info = extract_info_cached(ydl, video_url, strategy_key(ydl_opts)[1])
+            return ydl_opts, info, None, time.monotonic() - started
+        except yt_dlp_utils.DownloadCancelled:
+            return ydl_opts, None, None, time.monotonic() - started
+        except Exception as e:
+            return ydl_opts, None, e, time.monotonic() - started
+
+    pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="hedge")
+    try:
+        pending = {pool.submit(extract, ydl_opts) for ydl_opts in candidates}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                ydl_opts, info, error, latency = future.result()
+                if error is not None:
+                    logger.info(f"Hedged extraction lost: {error}")
+                    if on_failure:
+                        on_failure(ydl_opts, error, latency)
+                    continue
+                if info is None:
+                    continue
+                if info.get('_type', 'video') != 'video':
+                    return None
+                if has_usable_audio(info):
+                    done_event.set()
+                    logger.info(f"Hedged extraction won after {latency:.1f}s")
+                    return ydl_opts, info
+        return None
+    finally:
+        done_event.set()
+        # Losers stop at their next request, don't wait for them
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,124 @@
+"""
+Process-wide pooled HTTP session for thumbnails and other auxiliary requests.
+
+All cover downloads share one requests.Session whose adapter keeps up to
+POOL_MAXSIZE keep-alive connections per host, applies a default timeout and
+retries connection errors and 429/5xx answers with jittered exponential
+backoff. A playlist of 500 tracks therefore reuses a handful of TLS
+connections to the image CDN instead of performing 500 handshakes. stats()
+reports how many requests went over a reused connection.
+"""
+import logging
+import os
+import threading
+
+from lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+requests = lazy_import('requests')
+requests_adapters = lazy_import('requests.adapters')
+urllib3_retry = lazy_import('urllib3.util.retry')
+urllib3_pool = lazy_import('urllib3.connectionpool')
+
+# Hosts whose pools are kept open at the same time
+POOL_CONNECTIONS = int(os.environ.get('CONVERT2MP3_HTTP_POOL_HOSTS', 10))
+# Keep-alive connections per host
+POOL_MAXSIZE = int(os.environ.get('CONVERT2MP3_HTTP_POOL_SIZE', 8))
+# (connect, read) timeout in seconds for requests without an explicit timeout
+DEFAULT_TIMEOUT = (5, 15)
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+BACKOFF_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {'requests': 0, 'connections': 0, 'retries': 0, 'errors': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def _counting_pool(base):
+    """Subclass of a urllib3 connection pool that counts the connections it opens"""
+
+    class CountingPool(base):
+        def _new_conn(self):
+            _count('connections')
+            return super()._new_conn()
+
+    return CountingPool
+
+
+def _retry():
+    options = dict(total=RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES,
+                   allowed_methods=frozenset(('GET', 'HEAD')), respect_retry_after_header=True,
+                   raise_on_status=False)
+    try:
+        return urllib3_retry.Retry(backoff_jitter=BACKOFF_JITTER, **options)
+    except TypeError:
+        # urllib3 < 2 has no jitter
+        return urllib3_retry.Retry(**options)
+
+
+def _make_session():
+    class PooledAdapter(requests_adapters.HTTPAdapter):
+        """HTTPAdapter with a default timeout and request/connection counters"""
+
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': _counting_pool(urllib3_pool.HTTPConnectionPool),
+                'https': _counting_pool(urllib3_pool.HTTPSConnectionPool),
+            }
+
+        def send(self, request, timeout=None, **kwargs):
+            _count('requests')
+            try:
+                response = super().send(request, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+            except Exception:
+                _count('errors')
+                raise
+            history = getattr(response.raw, 'retries', None)
+            if history is not None and history.history:
+                _count('retries', len(history.history))
+            return response
+
+    session = requests.Session()
+    adapter = PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                            max_retries=_retry(), pool_block=False)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Return the shared session, created on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _make_session()
+        return _session
+
+
+def get(url, **kwargs):
+    """GET over the shared session"""
+    return get_session().get(url, **kwargs)
+
+
+def stats():
+    """Request, connection, retry and error counters plus the share of reused connections"""
+    with _stats_lock:
+        result = dict(_stats)
+    result['reused'] = max(0, result['requests'] - result['connections'])
+    result['reuse_rate'] = round(result['reused'] / result['requests'], 3) if result['requests'] else 0.0
+    return result
+
+
+def log_stats():
+    if _stats['requests']:
+        logger.info(f"HTTP pool: {stats()}")
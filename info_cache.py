@@ -0,0 +1,192 @@
+"""
+Cache for yt-dlp info dicts, keyed by video ID, player client and the
+extraction profile: the YoutubeDL options that can change the extracted info
+(extractor args such as skipped HLS formats, cookies, headers, geo bypass).
+A result extracted without HLS or without cookies is never served to a
+request that asks for them.
+
+Format checks, download strategies and the server often extract the same
+video several times within minutes. Cached entries live until shortly before
+the signed stream URLs inside them expire, are bounded in memory by an LRU
+and can optionally be written to disk to share them between processes.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+from lazy_imports import lazy_import
+from strategy_stats import video_id_from_url
+
+logger = logging.getLogger(__name__)
+
+yt_dlp_networking = lazy_import('yt_dlp.utils.networking')
+
+# Stop using an entry this many seconds before its stream URLs expire
+EXPIRY_MARGIN = 600
+
+# The only options that change what an extraction returns. Format, output,
+# post-processing, verbosity, timeouts and certificate checks do not, so a format
+# check, the download strategies and the server share cached results.
+EXTRACTION_OPTIONS = ('extractor_args', 'cookiefile', 'cookiesfrombrowser', 'http_headers', 'proxy',
+                      'geo_verification_proxy', 'geo_bypass', 'geo_bypass_country', 'geo_bypass_ip_block',
+                      'username', 'password', 'usenetrc', 'videopassword', 'age_limit')
+
+
+def url_expiry(info):
+    """Return the earliest 'expire' timestamp of the format URLs in info, or None"""
+    expiry = None
+    for fmt in info.get('formats') or []:
+        for url in (fmt.get('url'), fmt.get('manifest_url')):
+            if not url:
+                continue
+            values = parse_qs(urlparse(url).query).get('expire')
+            if not values:
+                # HLS/DASH manifest URLs carry it as a path segment: /expire/<ts>/
+                parts = urlparse(url).path.split('/')
+                values = [parts[parts.index('expire') + 1]] if 'expire' in parts[:-1] else None
+            if values and values[0].isdigit():
+                expiry = min(expiry or int(values[0]), int(values[0]))
+    return expiry
+
+
+def extraction_profile(options, cookiejar=None):
+    """
+    Short hash of the options that can change what an extraction returns.
+
+    :param options: yt-dlp options or YoutubeDL.params, both give the same profile.
+    :param cookiejar: Shared jar of a pooled YoutubeDL, it stands in for the
+        'cookiefile' option (see ydl_pool).
+    """
+    profile = {key: options[key] for key in EXTRACTION_OPTIONS if options.get(key) is not None}
+    # YoutubeDL fills in the standard headers, only additions and overrides count
+    headers = yt_dlp_networking.HTTPHeaderDict(yt_dlp_networking.std_headers, profile.pop('http_headers', {}))
+    if dict(headers) != dict(yt_dlp_networking.std_headers):
+        profile['http_headers'] = dict(headers)
+    cookiefile = getattr(cookiejar, 'filename', None) or profile.pop('cookiefile', None)
+    if cookiefile:
+        profile['cookiefile'] = os.path.abspath(os.path.expanduser(cookiefile))
+    raw = json.dumps(profile, sort_keys=True, default=repr)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class InfoCache:
+    """
+    LRU cache of extracted info dicts.
+
+    :param max_entries: Maximum number of entries kept in memory.
+    :param default_ttl: Lifetime in seconds if no URL expiry can be found.
+    :param disk_dir: Optional directory for a persistent copy of the cache.
+    """
+
+    def __init__(self, max_entries=128, default_ttl=1800, disk_dir=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (video_id, client, profile) -> (expires, info)
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, video_id, client='default', profile=''):
+        """Return a copy of a cached info dict, or None"""
+        key = (video_id, client, profile)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self._entries.pop(key, None)
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry and entry[0] > now:
+                self._store_locked(key, entry)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+        return None
+
+    def put(self, video_id, client, info, profile=''):
+        """Cache an info dict until shortly before its stream URLs expire"""
+        expiry = url_expiry(info)
+        expires = expiry - EXPIRY_MARGIN if expiry else time.time() + self.default_ttl
+        if expires <= time.time():
+            return
+        key = (video_id, client, profile)
+        entry = (expires, copy.deepcopy(info))
+        with self._lock:
+            self._store_locked(key, entry)
+        self._write_disk(key, entry)
+
+    def _store_locked(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, "_".join(part for part in key if part) + ".json")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r') as f:
+                data = json.load(f)
+            if data['expires'] <= time.time():
+                os.remove(self._disk_path(key))
+                return None
+            return data['expires'], data['info']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read cached info {key}: {e}")
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        try:
+            temp_path = self._disk_path(key) + ".tmp"
+            with open(temp_path, 'w') as f:
+                # Internal callables like '__post_extractor' can't be stored
+                json.dump({'expires': entry[0], 'info': entry[1]}, f, default=lambda _: None)
+            os.replace(temp_path, self._disk_path(key))
+        except Exception as e:
+            logger.warning(f"Could not write cached info {key}: {e}")
+
+
+# Process-wide cache shared by format checks, downloads and the server.
+# Set CONVERT2MP3_INFO_CACHE_DIR to share it between processes on disk.
+shared_cache = InfoCache(disk_dir=os.environ.get('CONVERT2MP3_INFO_CACHE_DIR'))
+
+
+def extract_info_cached(ydl, url, client='default', cache=shared_cache):
+    """
+    Extract url without processing, served from the cache when possible.
+
+    Only single videos are cached, separately per extraction_profile of ydl.
+    The returned dict is a private copy that can be passed to ydl.process_ie_result.
+    """
+    # watch?v=...&list=... may resolve to a playlist, never serve it from the cache
+    video_id = video_id_from_url(url) if 'list=' not in url else None
+    profile = extraction_profile(ydl.params, ydl.__dict__.get('cookiejar')) if video_id else ''
+    if video_id:
+        info = cache.get(video_id, client, profile)
+        if info is not None:
+            logger.info(f"Info cache hit for {video_id} ({client})")
+            return info
+    info = ydl.extract_info(url, download=False, process=False)
+    if video_id and info.get('_type', 'video') == 'video' and info.get('id') == video_id:
+        cache.put(video_id, client, info, profile)
+    return info
@@ -0,0 +1,145 @@
+"""
+Bounded job scheduler for download and transcode work.
+
+Jobs wait in a FIFO queue of limited size and are picked up by a fixed
+number of download workers. Once a job's download stage is done, its
+transcode stage is handed to a separate pool so the download worker can
+fetch the next job while FFmpeg is still busy.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised by JobScheduler.submit when the waiting queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """
+    Runs jobs through a bounded download pool and a bounded transcode pool.
+
+    :param download_workers: Number of jobs downloading at the same time.
+    :param transcode_workers: Number of transcode stages running at the same time.
+    :param max_queue: Maximum number of jobs waiting for a download worker.
+    """
+
+    def __init__(self, download_workers=2, transcode_workers=None, max_queue=100):
+        self.download_workers = max(1, download_workers)
+        self.transcode_workers = max(1, transcode_workers or os.cpu_count() or 1)
+        self.max_queue = max(1, max_queue)
+
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._avg_download_seconds = 30.0
+        self._shutdown = False
+
+        self._transcode_pool = ThreadPoolExecutor(
+            max_workers=self.transcode_workers,
+            thread_name_prefix="transcode"
+        )
+        self._workers = []
+        for i in range(self.download_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"download-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id, download_stage, transcode_stage=None):
+        """
+        Queue a job.
+
+        :param job_id: Unique ID of the job.
+        :param download_stage: Callable run on a download worker. Its return value
+            is passed to transcode_stage; returning None skips the transcode stage.
+        :param transcode_stage: Optional callable run on the transcode pool.
+        :return: 1-based position of the job in the queue.
+        :raises QueueFullError: If max_queue jobs are already waiting.
+        """
+        with self._cond:
+            if len(self._pending) >= self.max_queue:
+                raise QueueFullError(self._retry_after_locked())
+            self._pending[job_id] = (download_stage, transcode_stage)
+            self._cond.notify()
+            return len(self._pending)
+
+    def run_transcode(self, func, *args, **kwargs):
+        """Run func on the transcode pool and wait for its result"""
+        return self._transcode_pool.submit(func, *args, **kwargs).result()
+
+    def cancel(self, job_id):
+        """
+        Remove a job that is still waiting in the queue.
+
+        :return: True if the job was removed, False if it already started or is unknown.
+        """
+        with self._cond:
+            return self._pending.pop(job_id, None) is not None
+
+    def position(self, job_id):
+        """Return the 1-based queue position of a waiting job, or None"""
+        with self._cond:
+            for index, pending_id in enumerate(self._pending):
+                if pending_id == job_id:
+                    return index + 1
+        return None
+
+    def queued_count(self):
+        """Return the number of jobs waiting for a download worker"""
+        with self._cond:
+            return len(self._pending)
+
+    def retry_after(self):
+        """Estimate in seconds when a queue slot will become free"""
+        with self._cond:
+            return self._retry_after_locked()
+
+    def shutdown(self, wait=False):
+        """Stop accepting work and let the workers exit"""
+        with self._cond:
+            self._shutdown = True
+            self._pending.clear()
+            self._cond.notify_all()
+        self._transcode_pool.shutdown(wait=wait)
+
+    def _retry_after_locked(self):
+        waves = len(self._pending) / self.download_workers
+        return max(1, math.ceil(waves * self._avg_download_seconds))
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                job_id, (download_stage, transcode_stage) = self._pending.popitem(last=False)
+
+            started = time.monotonic()
+            try:
+                result = download_stage()
+            except Exception as e:
+                logger.error(f"Download stage of job {job_id} failed: {e}")
+                continue
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._avg_download_seconds = 0.8 * self._avg_download_seconds + 0.2 * elapsed
+
+            if transcode_stage is not None and result is not None:
+                self._transcode_pool.submit(self._run_transcode, job_id, transcode_stage, result)
+
+    def _run_transcode(self, job_id, transcode_stage, result):
+        try:
+            transcode_stage(result)
+        except Exception as e:
+            logger.error(f"Transcode stage of job {job_id} failed: {e}")
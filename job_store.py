@@ -0,0 +1,285 @@
+"""
+Job-state stores for the backend server.
+
+A store keeps the status record of every job (what /status returns) plus the
+original request parameters and a resume checkpoint (chosen format, partial
+file, finished playlist entries), so unfinished jobs can be picked up again
+after a restart. Finished jobs are evicted after a TTL and beyond a maximum count,
+so memory and disk usage stay flat over long uptimes.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ('completed', 'error', 'cancelled')
+
+
+class JobStore(ABC):
+    """
+    Interface for job-state stores.
+
+    :param ttl: Seconds a finished job is kept.
+    :param max_finished: Maximum number of finished jobs kept (least recently used are evicted).
+    """
+
+    def __init__(self, ttl=24 * 3600, max_finished=1000):
+        self.ttl = ttl
+        self.max_finished = max_finished
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(job_id, record) after every write of a status record"""
+        self._listeners.append(callback)
+
+    def _notify(self, job_id, record):
+        for callback in self._listeners:
+            try:
+                callback(job_id, dict(record))
+            except Exception as e:
+                logger.warning(f"Job store listener failed: {e}")
+
+    @abstractmethod
+    def create(self, job_id, record, request=None):
+        """Add a new job with its status record and request parameters"""
+
+    @abstractmethod
+    def get(self, job_id):
+        """Return a copy of the status record of a job, or None"""
+
+    @abstractmethod
+    def put(self, job_id, record):
+        """Replace the status record of a job"""
+
+    def update(self, job_id, **fields):
+        """Merge fields into the status record of a job"""
+        record = self.get(job_id)
+        if record is None:
+            return
+        record.update(fields)
+        self.put(job_id, record)
+
+    @abstractmethod
+    def delete(self, job_id):
+        """Remove a job"""
+
+    @abstractmethod
+    def checkpoint(self, job_id, **fields):
+        """Merge fields into the resume checkpoint of a job"""
+
+    @abstractmethod
+    def get_checkpoint(self, job_id):
+        """Return a copy of the resume checkpoint of a job, {} if there is none"""
+
+    @abstractmethod
+    def unfinished(self):
+        """Return (job_id, record, request) for every job that has not finished"""
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+
+class MemoryJobStore(JobStore):
+    """In-memory store with TTL and LRU eviction of finished jobs"""
+
+    def __init__(self, ttl=24 * 3600, max_finished=1000):
+        super().__init__(ttl, max_finished)
+        self._jobs = {}
+        self._checkpoints = {}
+        self._finished = OrderedDict()  # job_id -> finish time, oldest first
+        self._lock = threading.Lock()
+
+    def create(self, job_id, record, request=None):
+        with self._lock:
+            self._jobs[job_id] = (dict(record), request)
+            self._checkpoints.pop(job_id, None)
+            self._track_locked(job_id, record)
+            self._evict_locked()
+        self._notify(job_id, record)
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_locked()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job_id in self._finished:
+                self._finished.move_to_end(job_id)
+            return dict(job[0])
+
+    def put(self, job_id, record):
+        with self._lock:
+            request = self._jobs[job_id][1] if job_id in self._jobs else None
+            self._jobs[job_id] = (dict(record), request)
+            self._track_locked(job_id, record)
+            self._evict_locked()
+        self._notify(job_id, record)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._checkpoints.pop(job_id, None)
+            self._finished.pop(job_id, None)
+
+    def checkpoint(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._checkpoints.setdefault(job_id, {}).update(fields)
+
+    def get_checkpoint(self, job_id):
+        with self._lock:
+            return dict(self._checkpoints.get(job_id, {}))
+
+    def unfinished(self):
+        with self._lock:
+            return [(job_id, dict(record), request)
+                    for job_id, (record, request) in self._jobs.items()
+                    if job_id not in self._finished]
+
+    def _track_locked(self, job_id, record):
+        if record.get('status') in FINISHED_STATES:
+            self._finished[job_id] = time.time()
+            self._finished.move_to_end(job_id)
+        else:
+            self._finished.pop(job_id, None)
+
+    def _evict_locked(self):
+        cutoff = time.time() - self.ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= cutoff and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            self._checkpoints.pop(job_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    SQLite store in WAL mode, survives restarts.
+
+    Expired finished jobs are pruned every `prune_interval` writes. Like
+    MemoryJobStore it evicts the least recently used finished jobs first: get()
+    refreshes the `accessed` time of a finished job.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_finished=1000, prune_interval=100):
+        super().__init__(ttl, max_finished)
+        self.path = path
+        self.prune_interval = prune_interval
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " request TEXT,"
+            " updated REAL NOT NULL,"
+            " finished REAL,"
+            " checkpoint TEXT,"
+            " accessed REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'checkpoint' not in columns:
+            # Database from a version without checkpoints
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN checkpoint TEXT")
+        if 'accessed' not in columns:
+            # Database from a version that evicted by last update
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN accessed REAL")
+            self._conn.execute("UPDATE jobs SET accessed = updated")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished)")
+        self._prune()
+
+    def create(self, job_id, record, request=None):
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, record, request, updated, finished, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, record.get('status', ''), json.dumps(record),
+                 json.dumps(request) if request is not None else None,
+                 now, now if record.get('status') in FINISHED_STATES else None, now)
+            )
+            self._after_write_locked()
+        self._notify(job_id, record)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, finished FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[1] is not None:
+                if row[1] < now - self.ttl:
+                    return None
+                self._conn.execute("UPDATE jobs SET accessed = ? WHERE id = ?", (now, job_id))
+        return json.loads(row[0])
+
+    def put(self, job_id, record):
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, record = ?, updated = ?, finished = ?, accessed = ? WHERE id = ?",
+                (record.get('status', ''), json.dumps(record), now,
+                 now if record.get('status') in FINISHED_STATES else None, now, job_id)
+            )
+            self._after_write_locked()
+        self._notify(job_id, record)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def checkpoint(self, job_id, **fields):
+        with self._lock:
+            row = self._conn.execute("SELECT checkpoint FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            checkpoint = json.loads(row[0]) if row[0] else {}
+            checkpoint.update(fields)
+            self._conn.execute("UPDATE jobs SET checkpoint = ? WHERE id = ?", (json.dumps(checkpoint), job_id))
+
+    def get_checkpoint(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT checkpoint FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def unfinished(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, record, request FROM jobs WHERE finished IS NULL ORDER BY updated"
+            ).fetchall()
+        return [(job_id, json.loads(record), json.loads(request) if request else None)
+                for job_id, record, request in rows]
+
+    def _after_write_locked(self):
+        self._writes += 1
+        if self._writes % self.prune_interval == 0:
+            self._prune_locked()
+
+    def _prune(self):
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        self._conn.execute(
+            "DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?",
+            (time.time() - self.ttl,)
+        )
+        self._conn.execute(
+            "DELETE FROM jobs WHERE id IN ("
+            " SELECT id FROM jobs WHERE finished IS NOT NULL"
+            " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_finished,)
+        )
@@ -0,0 +1,67 @@
+"""
+Deferred imports of heavy dependencies.
+
+yt-dlp (with its extractor registry), requests, mutagen and Pillow take a
+noticeable part of the start time of the GUI and the server, but are only
+needed once the first download runs. lazy_import returns a stand-in that
+imports the real module on first attribute access. The import itself goes
+through importlib, so concurrent first uses from several threads are safe.
+
+Set CONVERT2MP3_EAGER_IMPORTS=1 to import everything at start, e.g. to compare
+start times with benchmarks/bench_startup.py.
+"""
+import importlib
+import os
+import sys
+import threading
+
+EAGER = os.environ.get('CONVERT2MP3_EAGER_IMPORTS') == '1'
+
+# Modules only needed once a download runs
+DOWNLOAD_STACK = ('yt_dlp', 'requests', 'mutagen.mp3', 'mutagen.id3', 'PIL.Image')
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """Return a LazyModule for name, loaded right away if EAGER is set or the module is already imported"""
+    module = LazyModule(name)
+    if EAGER or name in sys.modules:
+        module._load()
+    return module
+
+
+def preload(names=DOWNLOAD_STACK):
+    """Import modules now, e.g. from a background thread once the UI is up"""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # Reported when the module is actually used
+            pass
+
+
+def preload_in_background(names=DOWNLOAD_STACK):
+    """Start preload on a daemon thread, so the first download does not pay for the imports"""
+    thread = threading.Thread(target=preload, args=(names,), name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,162 @@
+"""
+Incremental sync of a channel or playlist into a local folder.
+
+The playlist is enumerated with flat, lazy extraction (channel tabs and nested
+playlists included), diffed by video ID against the download archive and the
+files already in the folder, and only the missing entries are fully extracted
+and downloaded.
+
+Usage: python library_sync.py URL FOLDER [--quality 192] [--dry-run]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from cancellation import CancelToken
+from download_archive import DownloadArchive
+from engine import DownloadEngine, source_options
+from lazy_imports import lazy_import
+from ydl_pool import shared_pool
+from playlist_pipeline import resolve_playlist, entry_url
+from transcoder import ORIGINAL_CONTAINERS
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import('yt_dlp')
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), ".convert2mp3", "archive.db")
+
+# Extractors whose flat entries are playlists themselves (e.g. the tabs of a channel)
+NESTED_PLAYLIST_IES = ('YoutubeTab',)
+
+# Extensions a converted file can have, MP3 or kept in its original codec
+AUDIO_EXTENSIONS = sorted(set(ORIGINAL_CONTAINERS.values()))
+
+
+def flat_entries(ydl, entries, max_depth=2):
+    """
+    Yield the video entries of a lazily extracted playlist.
+
+    Nested playlists such as the Videos/Shorts tabs of a channel are expanded
+    up to max_depth levels; entries are yielded once per video ID.
+    """
+    seen = set()
+
+    def walk(entries, depth):
+        for entry in entries:
+            if not entry:
+                continue
+            nested = entry.get('_type') == 'playlist' or entry.get('ie_key') in NESTED_PLAYLIST_IES
+            if nested and depth < max_depth:
+                if entry.get('_type') == 'playlist':
+                    children = entry.get('entries') or []
+                else:
+                    children = ydl.extract_info(entry_url(entry), download=False, process=False,
+                                                ie_key=entry.get('ie_key')).get('entries') or []
+                yield from walk(children, depth + 1)
+                continue
+            video_id = entry.get('id')
+            if video_id in seen:
+                continue
+            seen.add(video_id)
+            yield entry
+
+    return walk(entries, 0)
+
+
+def local_video_ids(output_folder, quality, archive):
+    """Return the IDs of videos already converted into output_folder"""
+    return archive.ids_in(output_folder, quality)
+
+
+def is_local(entry, have_ids, output_folder):
+    """True if an entry is in the archive or a file named after its title exists"""
+    if entry.get('id') in have_ids:
+        return True
+    # Files converted before the archive existed are matched by their title
+    title = entry.get('title')
+    if not title:
+        return False
+    base = os.path.join(output_folder, yt_dlp.utils.sanitize_filename(title))
+    return any(os.path.exists(f"{base}.{extension}") for extension in AUDIO_EXTENSIONS)
+
+
+def plan_sync(ydl, url, output_folder, quality, archive, client='default'):
+    """
+    Enumerate url and diff it against the local library.
+
+    :return: Tuple (info, new_entries, total): the playlist info, the entries
+        that still have to be downloaded and the number of entries in the playlist.
+    """
+    info, entries = resolve_playlist(ydl, url, client)
+    if entries is None:
+        entries = [info]
+    have_ids = local_video_ids(output_folder, quality, archive)
+    new_entries = []
+    total = 0
+    for entry in flat_entries(ydl, entries):
+        total += 1
+        if not is_local(entry, have_ids, output_folder):
+            new_entries.append(entry)
+    logger.info(f"Sync of {url}: {total} entries, {len(new_entries)} new")
+    return info, new_entries, total
+
+
+def sync_playlist(url, output_folder, quality="192", artist="Unknown", album="Unknown",
+                  archive=None, concurrency=3, dry_run=False):
+    """
+    Download the entries of url that are not yet in output_folder.
+
+    :return: Tuple (total, new_entries, states); states is empty for a dry run.
+    """
+    archive = archive or DownloadArchive(DEFAULT_ARCHIVE_PATH)
+    os.makedirs(output_folder, exist_ok=True)
+    ydl_opts = source_options(output_folder, quiet=True)
+    with shared_pool.checkout(ydl_opts) as ydl:
+        _, new_entries, total = plan_sync(ydl, url, output_folder, quality, archive)
+    if dry_run or not new_entries:
+        return total, new_entries, []
+
+    def report(state, count):
+        if state['status'] in ('completed', 'error'):
+            print(f"[{state['index']}/{count}] {state['status']}: {state['title']}")
+
+    engine = DownloadEngine(quality, archive=archive, concurrency=concurrency)
+    states = engine.run_playlist(new_entries, ydl_opts, output_folder, artist, album, CancelToken(),
+                                 total=len(new_entries), on_entry_status=report)
+    return total, new_entries, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download only the new entries of a channel or playlist")
+    parser.add_argument("url")
+    parser.add_argument("folder")
+    parser.add_argument("--quality", default="192", choices=["128", "192", "320"])
+    parser.add_argument("--artist", default="Unknown")
+    parser.add_argument("--album", default="Unknown")
+    parser.add_argument("--concurrency", type=int, default=3, help="Entries processed at the same time")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="Download archive database")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the entries that would be downloaded")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.archive)), exist_ok=True)
+    try:
+        total, new_entries, states = sync_playlist(
+            args.url, args.folder, args.quality, args.artist, args.album,
+            archive=DownloadArchive(args.archive), concurrency=args.concurrency, dry_run=args.dry_run)
+    except yt_dlp.DownloadError as e:
+        print(f"Sync failed: {e}")
+        return 1
+    print(f"{total} entries, {total - len(new_entries)} already in {args.folder}, {len(new_entries)} new")
+    if args.dry_run:
+        for entry in new_entries:
+            print(f"  {entry.get('id')}  {entry.get('title')}")
+        return
+    failed = [state for state in states if state['status'] == 'error']
+    print(f"Downloaded {len(states) - len(failed)}, failed {len(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
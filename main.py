@@ -4,20 +4,77 @@ Python GUI application to download audio from YouTube videos as MP3 files.
 import os
 import logging
 import threading
-import requests
 import tkinter as tk
 from tkinter import messagebox, filedialog, PhotoImage, ttk
 from PIL import ImageTk, Image
-import yt_dlp
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC
 import re
-import queue
+import time
+import uuid
+from engine import DownloadEngine
+import http_pool
+from lazy_imports import lazy_import, preload_in_background
+from playlist_pipeline import resolve_playlist
+from strategy_stats import StrategyStats, strategy_key, video_id_from_url
+from info_cache import extract_info_cached
+from hedging import race_extraction
+from progress_channel import ProgressChannel, SpeedEstimator, format_rate, UI_FPS
+from cancellation import CancelToken
+import cookie_jars
+from job_store import SQLiteJobStore
+from download_archive import DownloadArchive
+from progress_events import ProgressHook
+from ydl_pool import shared_pool
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(filename="app.log", level=logging.DEBUG, format="%(asctime)s:%(levelname)s:%(message)s")
 
+# Imported on first use, the window is shown before yt-dlp is loaded
+yt_dlp = lazy_import('yt_dlp')
+
+# Number of strategies whose extraction is raced in hedged mode
+HEDGE_TOP_K = 3
+
+# Checkpoints of running downloads, so interrupted ones can be resumed on the next start
+GUI_JOBS_DB = os.path.join(os.path.expanduser("~"), ".convert2mp3", "gui_jobs.db")
+# Converted videos by ID, playlist entries found here are not downloaded again
+ARCHIVE_DB = os.path.join(os.path.expanduser("~"), ".convert2mp3", "archive.db")
+# Seconds between two checkpoint writes while downloading
+CHECKPOINT_INTERVAL = 1.0
+# Seconds before a stalled connection fails, the same default as the server and the CLI
+SOCKET_TIMEOUT = int(os.environ.get('CONVERT2MP3_SOCKET_TIMEOUT', 20))
+
+# Batch job states that free a slot in the batch queue
+BATCH_DONE_STATES = ('completed', 'error', 'cancelled')
+
+
+class BatchJob:
+    """
+    One URL in the batch queue.
+
+    :param job_id: Number of the job, shown in its row.
+    :param url: Video or playlist URL.
+    :param folder: Destination folder.
+    :param artist: Artist name to set in metadata.
+    :param album: Album name to set in metadata.
+    :param store_id: ID of the job's record in the GUI job store, a new one if None.
+    """
+
+    def __init__(self, job_id, url, folder, artist, album, store_id=None):
+        self.id = job_id
+        self.store_id = store_id or uuid.uuid4().hex
+        self.url = url
+        self.folder = folder
+        self.artist = artist
+        self.album = album
+        self.state = 'pending'
+        self.cancel_token = CancelToken()
+        self.error = None
+        self.speed = SpeedEstimator()
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
 class MyGUI:
     """
     class for the GUI and application logic
@@ -86,7 +143,17 @@ class MyGUI:
         self.download_directory = ""
         self.downloading = False
         self.cancel_download = False
-        self.update_queue = queue.Queue()
+        self.cancel_token = CancelToken()
+        os.makedirs(os.path.dirname(GUI_JOBS_DB), exist_ok=True)
+        self.job_store = SQLiteJobStore(GUI_JOBS_DB)
+        self.download_archive = DownloadArchive(ARCHIVE_DB)
+        self.progress_channel = ProgressChannel()
+        self.download_speed = SpeedEstimator()
+        self.batch_jobs = {}  # job id -> BatchJob, in the order they were added
+        self.batch_rows = {}  # job id -> widgets of the job's row
+        self.batch_started = None
+        self.batch_counter = 0
+        self.strategy_stats = StrategyStats()
 
         # Create main content frame
         content_frame = tk.Frame(self.scrollable_frame, bg="#BFBFBF")
@@ -136,6 +203,15 @@ class MyGUI:
         self.fast_download = tk.BooleanVar(value=True)
         tk.Checkbutton(speed_frame, text="Fast Download (avoid HLS)", variable=self.fast_download, 
                       bg="#BFBFBF", selectcolor="#D4D0C8").pack(side="left")
+        self.hedged_mode = tk.BooleanVar(value=False)
+        tk.Checkbutton(speed_frame, text="Race Clients (hedged)", variable=self.hedged_mode,
+                      bg="#BFBFBF", selectcolor="#D4D0C8").pack(side="left")
+        self.ffmpeg_tagging = tk.BooleanVar(value=False)
+        tk.Checkbutton(speed_frame, text="Tag during conversion (FFmpeg)", variable=self.ffmpeg_tagging,
+                      bg="#BFBFBF", selectcolor="#D4D0C8").pack(side="left")
+        self.keep_original_codec = tk.BooleanVar(value=False)
+        tk.Checkbutton(speed_frame, text="Keep original codec (Opus/M4A)", variable=self.keep_original_codec,
+                      bg="#BFBFBF", selectcolor="#D4D0C8").pack(side="left")
         
         # Add cookie usage preference
         cookie_frame = tk.Frame(content_frame, bg="#BFBFBF")
@@ -170,6 +246,16 @@ class MyGUI:
         tk.Radiobutton(format_frame, text="Direct (Fast)", variable=self.format_var, value="direct", bg="#BFBFBF").pack(side="left")
         tk.Radiobutton(format_frame, text="HLS (Compatible)", variable=self.format_var, value="hls", bg="#BFBFBF").pack(side="left")
 
+        # Number of playlist tracks processed at the same time
+        playlist_frame = tk.Frame(content_frame, bg="#BFBFBF")
+        playlist_frame.pack(pady=5)
+        tk.Label(playlist_frame, text="Parallel Playlist Tracks:", bg="#BFBFBF", fg="black").pack(side="left")
+        self.playlist_concurrency = tk.IntVar(value=3)
+        tk.Spinbox(playlist_frame, from_=1, to=8, width=3, textvariable=self.playlist_concurrency).pack(side="left", padx=5)
+        self.playlist_fanout = tk.BooleanVar(value=True)
+        tk.Checkbutton(playlist_frame, text="Fan-out (list first)", variable=self.playlist_fanout,
+                      bg="#BFBFBF", selectcolor="#D4D0C8").pack(side="left")
+
         buttonframe = tk.Frame(content_frame, bg="#BFBFBF")
         buttonframe.columnconfigure(0, weight=1)
         buttonframe.columnconfigure(1, weight=1)
@@ -192,6 +278,28 @@ class MyGUI:
                                       command=self.cancel_download_process)
         self.cancel_button.pack(pady=5)
         self.cancel_button.config(state="disabled")
+
+        # Batch queue: many URLs, processed by a bounded number of parallel jobs
+        tk.Label(content_frame, text="Batch Queue (one URL per line):", bg="#BFBFBF", fg="black",
+                 font=("Helvetica", 10, "bold")).pack(pady=5, anchor="w")
+        self.batch_text = tk.Text(content_frame, width=50, height=4)
+        self.batch_text.pack(pady=5)
+        batch_buttons = tk.Frame(content_frame, bg="#BFBFBF")
+        batch_buttons.pack(pady=5)
+        tk.Button(batch_buttons, text="Load File", bg="#D4D0C8", fg="black", relief="ridge",
+                  command=self.load_batch_file).pack(side="left", padx=2)
+        tk.Button(batch_buttons, text="Add to Queue", bg="#D4D0C8", fg="black", relief="ridge",
+                  command=self.add_batch_jobs).pack(side="left", padx=2)
+        tk.Button(batch_buttons, text="Clear Finished", bg="#D4D0C8", fg="black", relief="ridge",
+                  command=self.clear_finished_jobs).pack(side="left", padx=2)
+        tk.Label(batch_buttons, text="Parallel Jobs:", bg="#BFBFBF", fg="black").pack(side="left", padx=(8, 0))
+        self.batch_concurrency = tk.IntVar(value=2)
+        tk.Spinbox(batch_buttons, from_=1, to=8, width=3, textvariable=self.batch_concurrency,
+                   command=self.dispatch_batch_jobs).pack(side="left", padx=2)
+        self.batch_frame = tk.Frame(content_frame, bg="#BFBFBF")
+        self.batch_frame.pack(pady=5, fill="x")
+        self.throughput_label = tk.Label(content_frame, text="", bg="#BFBFBF", fg="black")
+        self.throughput_label.pack(pady=2)
         
         # Add collapsible Advanced Tools section
         self.advanced_frame = tk.Frame(content_frame, bg="#BFBFBF")
@@ -247,28 +355,42 @@ class MyGUI:
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # Start checking for updates from download thread
-        self.root.after(100, self.check_queue)
+        self.root.after(1000 // UI_FPS, self.check_queue)
+        
+        # Offer to continue downloads that were interrupted by a crash or quit
+        self.root.after(500, self.resume_interrupted_jobs)
+        
+        # Load the download stack once the window has been painted
+        self.root.after_idle(preload_in_background)
         
         logger.info("Application started.")
         self.root.mainloop()
         
     def check_queue(self):
-        """Check for updates from download thread"""
+        """Apply the latest updates from the download threads, once per frame"""
         try:
-            while True:
-                update = self.update_queue.get_nowait()
-                if update['type'] == 'progress':
-                    self.progressbar['value'] = update['value']
-                elif update['type'] == 'status':
-                    self.status_label.config(text=update['text'])
-        except queue.Empty:
-            pass
+            for job_id, kind, values in self.progress_channel.drain():
+                if job_id is not None:
+                    self.apply_job_update(job_id, kind, values)
+                # Skip no-op reconfigures, Tk redraws on every config call
+                elif kind == 'progress' and self.progressbar['value'] != values['value']:
+                    self.progressbar['value'] = values['value']
+                elif kind == 'status' and self.status_label.cget('text') != values['text']:
+                    self.status_label.config(text=values['text'])
+            self.update_throughput()
         finally:
-            self.root.after(100, self.check_queue)
+            self.root.after(1000 // UI_FPS, self.check_queue)
     
-    def update_progress(self, progress_type, **kwargs):
-        """Thread-safe way to update UI"""
-        self.update_queue.put({'type': progress_type, **kwargs})
+    def update_progress(self, progress_type, job=None, **kwargs):
+        """Thread-safe way to update UI, only the latest value per job and type is shown"""
+        self.progress_channel.post(progress_type, job_id=job.id if job is not None else None, **kwargs)
+
+    def show_error(self, title, message, job=None):
+        """Show an error in a message box, or in the row of a batch job"""
+        if job is None:
+            messagebox.showerror(title, message)
+        else:
+            job.error = message.partition("\n")[0]
 
     def is_valid_youtube_url(self, url):
         """Validate YouTube URL format"""
@@ -290,7 +412,8 @@ class MyGUI:
             filename = filename[:200]
         return filename
 
-    def download_audio(self, video_url, output_folder="/Desktop/downloads", artist="Unknown", album="Unknown"):
+    def download_audio(self, video_url, output_folder="/Desktop/downloads", artist="Unknown", album="Unknown", job=None,
+                       cancel_token=None, store_id=None):
         """
         Downloads the audio from a YouTube video as an MP3 file and sets metadata.
         
@@ -298,6 +421,12 @@ class MyGUI:
         :param output_folder: Folder to save the MP3 file.
         :param artist: Artist name to set in metadata.
         :param album: Album name to set in metadata.
+        :param job: BatchJob when run from the batch queue; progress and errors then go
+            to the job's row instead of the main progress bar and message boxes.
+        :param cancel_token: CancelToken of the main download, captured when it was started;
+            batch jobs use their own.
+        :param store_id: Job store ID of the main download; batch jobs use their own.
+        :return: True if the download succeeded.
         """
         # Check if output directory is writable
         try:
@@ -310,17 +439,21 @@ class MyGUI:
             os.remove(test_file)
         except PermissionError:
             error_msg = f"Permission denied: Cannot write to '{output_folder}'\n\nThis usually means:\n1. The folder is on a read-only drive\n2. You don't have write permissions\n3. The drive is not properly mounted\n\nTry selecting a different folder (like Desktop or Documents)."
-            messagebox.showerror("Permission Error", error_msg)
+            self.show_error("Permission Error", error_msg, job)
             logger.error(f"Permission denied for output folder: {output_folder}")
             return
         except Exception as e:
             error_msg = f"Cannot access output folder '{output_folder}': {str(e)}\n\nPlease select a different folder."
-            messagebox.showerror("Folder Error", error_msg)
+            self.show_error("Folder Error", error_msg, job)
             logger.error(f"Cannot access output folder {output_folder}: {e}")
             return
 
         quality = self.quality_var.get()
         output_template = f'{output_folder}/%(title)s.%(ext)s'
+        if job is not None:
+            cancel_token, store_id = job.cancel_token, job.store_id
+        checkpoint = self.job_store.get_checkpoint(store_id)
+        progress_hook = lambda d: self.progress_hook(d, cancel_token, job)
         
         # Build download strategies based on user preferences
         download_strategies = []
@@ -328,25 +461,12 @@ class MyGUI:
         # Define different client types to try (to avoid SABR streaming issues)
         client_types = ['android', 'web', 'ios', 'tv_embedded']
         
-        # Set FFmpeg settings based on conversion speed preference
-        if self.conversion_speed.get() == "fast":
-            ffmpeg_preset = "ultrafast"
-            ffmpeg_threads = "0"  # Use all available CPU cores
-            ffmpeg_loglevel = "error"  # Minimal logging for speed
-        elif self.conversion_speed.get() == "balanced":
-            ffmpeg_preset = "veryfast"
-            ffmpeg_threads = "0"
-            ffmpeg_loglevel = "warning"
-        else:  # quality
-            ffmpeg_preset = "fast"
-            ffmpeg_threads = "0"
-            ffmpeg_loglevel = "info"
-        
         # Common yt-dlp options for all strategies
         # Don't skip DASH/HLS as they might be the only formats available
         # Instead, we'll try different client types to avoid SABR streaming
         common_opts = {
             'nocheckcertificate': True,
+            'socket_timeout': SOCKET_TIMEOUT,
         }
         
         # Only skip formats if user explicitly wants to avoid HLS
@@ -366,23 +486,23 @@ class MyGUI:
             cookie_path = self.cookie_file_path.get()
             if cookie_path:
                 try:
-                    with open(cookie_path, 'r') as f:
-                        cookie_data = f.read()
-                    common_opts['cookies'] = cookie_data
+                    # Parsed once here, all strategy attempts share the jar (see cookie_jars)
+                    cookie_jars.get_jar(cookie_path)
+                    common_opts['cookiefile'] = cookie_path
                     logger.info(f"Using cookie file from: {cookie_path}")
                 except FileNotFoundError:
                     error_msg = f"Cookie file not found at: {cookie_path}\nPlease select a valid cookie file."
-                    messagebox.showerror("Cookie Error", error_msg)
+                    self.show_error("Cookie Error", error_msg, job)
                     logger.error(f"Cookie file not found: {cookie_path}")
                     return
                 except Exception as e:
                     error_msg = f"Error reading cookie file {cookie_path}: {str(e)}\nPlease ensure it's a valid cookie file."
-                    messagebox.showerror("Cookie Error", error_msg)
+                    self.show_error("Cookie Error", error_msg, job)
                     logger.error(f"Error reading cookie file {cookie_path}: {e}")
                     return
             else:
                 error_msg = "Please select a cookie file path."
-                messagebox.showerror("Cookie Error", error_msg)
+                self.show_error("Cookie Error", error_msg, job)
                 logger.error("No cookie file path selected.")
                 return
         else:
@@ -402,28 +522,16 @@ class MyGUI:
                     # Strategy: Direct audio formats with specific client
                     {
                         'format': 'bestaudio[ext=mp3]/bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio[protocol!=m3u8]/bestaudio',
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': quality,
-                        }],
                         'outtmpl': output_template,
-                        'postprocessor_args': ['-preset', ffmpeg_preset, '-threads', ffmpeg_threads, '-loglevel', ffmpeg_loglevel],
-                        'progress_hooks': [self.progress_hook],
+                        'progress_hooks': [progress_hook],
                         'verbose': True,
                         **opts
                     },
                     # Strategy: More permissive format selection with client
                     {
                         'format': 'bestaudio[protocol!=m3u8]/bestaudio/best[height<=480]',
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': quality,
-                        }],
                         'outtmpl': output_template,
-                        'postprocessor_args': ['-preset', ffmpeg_preset, '-threads', ffmpeg_threads, '-loglevel', ffmpeg_loglevel],
-                        'progress_hooks': [self.progress_hook],
+                        'progress_hooks': [progress_hook],
                         'verbose': True,
                         **opts
                     }
@@ -440,14 +548,8 @@ class MyGUI:
                 }
                 download_strategies.append({
                     'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': quality,
-                    }],
                     'outtmpl': output_template,
-                    'postprocessor_args': ['-preset', ffmpeg_preset, '-threads', ffmpeg_threads, '-loglevel', ffmpeg_loglevel],
-                    'progress_hooks': [self.progress_hook],
+                    'progress_hooks': [progress_hook],
                     'verbose': True,
                     **opts
                 })
@@ -463,70 +565,105 @@ class MyGUI:
             # Fallback 1: Try bestaudio
             download_strategies.append({
                 'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': quality,
-                }],
                 'outtmpl': output_template,
-                'postprocessor_args': ['-preset', ffmpeg_preset, '-threads', ffmpeg_threads, '-loglevel', ffmpeg_loglevel],
-                'progress_hooks': [self.progress_hook],
+                'progress_hooks': [progress_hook],
                 'verbose': True,
                 **opts
             })
             # Fallback 2: Try any format (video+audio, then extract audio)
             download_strategies.append({
                 'format': 'best[height<=720]/best',  # Try video formats too, then extract audio
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': quality,
-                }],
                 'outtmpl': output_template,
-                'postprocessor_args': ['-preset', ffmpeg_preset, '-threads', ffmpeg_threads, '-loglevel', ffmpeg_loglevel],
-                'progress_hooks': [self.progress_hook],
+                'progress_hooks': [progress_hook],
                 'verbose': True,
                 **opts
             })
 
+        # Try strategies that worked recently first and skip known dead ends for this video
+        video_id = video_id_from_url(video_url)
+        download_strategies = self.strategy_stats.rank(download_strategies, video_id)
+
+        # Resuming: start with the strategy that wrote the .part file
+        resume_strategy = None
+        for ydl_opts in download_strategies:
+            if strategy_key(ydl_opts)[0] == checkpoint.get('strategy'):
+                resume_strategy = ydl_opts
+                download_strategies.remove(ydl_opts)
+                download_strategies.insert(0, ydl_opts)
+                break
+
+        # Hedged mode: race the extraction of the top strategies and start with the winner
+        prefetched = {}
+        if self.hedged_mode.get() and resume_strategy is None:
+            self.update_progress('status', text=f"Racing up to {min(HEDGE_TOP_K, len(download_strategies))} download methods...", job=job)
+            try:
+                winner = race_extraction(
+                    video_url, download_strategies, top_k=HEDGE_TOP_K,
+                    on_failure=lambda opts, error, latency: self.strategy_stats.record(
+                        opts, False, latency, error=error, video_id=video_id)
+                )
+            except Exception as e:
+                logger.warning(f"Hedged extraction failed, falling back to sequential strategies: {e}")
+                winner = None
+            if winner:
+                winner_opts, winner_info = winner
+                download_strategies.remove(winner_opts)
+                download_strategies.insert(0, winner_opts)
+                prefetched[id(winner_opts)] = winner_info
+
+        # Strategies only download the source; the engine then converts it, or copies the
+        # stream when plan_transcode allows it, with the speed profile and tag mode of the window
+        engine = self.build_engine(quality)
+
         for i, ydl_opts in enumerate(download_strategies):
+            if cancel_token.cancelled:
+                break
+            started = time.monotonic()
             try:
-                self.update_progress('status', text=f"Trying download method {i+1}...")
+                self.update_progress('status', text=f"Trying download method {i+1}...", job=job)
                 logger.info(f"Attempting download with strategy {i+1}")
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=True)
-
-                    if '_type' in info and info['_type'] == 'playlist':
-                        for entry in info['entries']:
-                            if self.cancel_download:
-                                break
-                            filename = ydl.prepare_filename(entry).replace(".webm", ".mp3").replace(".m4a", ".mp3").replace(".mp4", ".mp3")
-                            audio = EasyID3(filename)
-                            audio["artist"] = artist
-                            audio["album"] = album
-                            audio["title"] = entry.get("title", "Unknown Title")
-                            audio.save()
-                            thumbnail_path = self.save_thumbnail(entry, filename)
+                # Checkpoint the chosen format and the .part file as the download goes
+                def save_checkpoint(p, strategy=strategy_key(ydl_opts)[0]):
+                    if p['format_id']:
+                        self.job_store.checkpoint(store_id, strategy=strategy, format_id=p['format_id'],
+                                                  part_file=p['tmpfilename'], downloaded_bytes=p['downloaded_bytes'])
+                run_opts = dict(ydl_opts, progress_hooks=ydl_opts['progress_hooks'] + [
+                    ProgressHook(save_checkpoint, CHECKPOINT_INTERVAL)])
+                if ydl_opts is resume_strategy and checkpoint.get('format_id'):
+                    # Same format as before, so yt-dlp continues the .part file with a range request
+                    run_opts['format'] = f"{checkpoint['format_id']}/{run_opts['format']}"
+                    logger.info(f"Resuming {video_url} with format {checkpoint['format_id']} "
+                                f"from {checkpoint.get('downloaded_bytes', 0)} bytes")
+                with shared_pool.checkout(run_opts) as ydl:
+                    if id(ydl_opts) in prefetched:
+                        info, entries = prefetched.pop(id(ydl_opts)), None
                     else:
-                        filename = ydl.prepare_filename(info).replace(".webm", ".mp3").replace(".m4a", ".mp3").replace(".mp4", ".mp3")
-                        # Add metadata using mutagen
-                        audio = EasyID3(filename)
-                        audio["artist"] = artist
-                        audio["album"] = album
-                        audio["title"] = info.get("title", "Unknown Title")
-                        audio.save()
+                        info, entries = resolve_playlist(ydl, video_url, strategy_key(ydl_opts)[1])
 
-                        # Save the thumbnail
-                        thumbnail_path = self.save_thumbnail(info, filename) 
+                    if entries is not None:
+                        self.download_playlist(engine, entries, ydl_opts, output_folder, artist, album, cancel_token, store_id,
+                                               info.get('playlist_count'), job)
+                    else:
+                        info, source_path = engine.download(ydl, info)
+                        self.update_progress('status', text="Converting and tagging...", job=job)
+                        cancel_token.track(source_path)
+                        engine.convert(info, source_path, artist, album, cancel_event=cancel_token)
 
                 # If we get here, download was successful
+                self.strategy_stats.record(ydl_opts, True, time.monotonic() - started, video_id=video_id)
+                if job is not None:
+                    logger.info(f"Batch job {job.id}: downloaded {video_url} to {output_folder} using strategy {i+1}")
+                    return True
                 if not self.cancel_download:
                     messagebox.showinfo("Success", f"Download complete with metadata and thumbnail!\nUsed method {i+1}")
                     logger.info(f"Successfully downloaded audio from {video_url} to {output_folder} using strategy {i+1}")
-                    return
+                    return True
                     
             except yt_dlp.DownloadError as e:
+                if cancel_token.cancelled:
+                    break
+                self.strategy_stats.record(ydl_opts, False, time.monotonic() - started, error=e, video_id=video_id)
                 error_msg = f"Strategy {i+1} failed: {str(e)}"
                 if "audio conversion failed" in str(e).lower():
                     error_msg += "\n\nThis usually means FFmpeg couldn't convert the audio format."
@@ -542,12 +679,15 @@ class MyGUI:
                 
                 if i == len(download_strategies) - 1:  # Last strategy
                     error_msg += "\n\nAll download methods failed. Try:\n1. Check if the video has audio content\n2. Try a different video\n3. Check available disk space\n4. Verify FFmpeg installation\n5. Try a different output folder\n6. Wait a bit before trying again (YouTube rate limiting)\n7. This video might only have images (no audio)"
-                    messagebox.showerror("Download Error", error_msg)
+                    self.show_error("Download Error", error_msg, job)
                     logger.error(f"All download strategies failed for {video_url}")
                 else:
                     continue  # Try next strategy
                     
             except Exception as e:
+                if cancel_token.cancelled:
+                    break
+                self.strategy_stats.record(ydl_opts, False, time.monotonic() - started, error=e, video_id=video_id)
                 error_msg = f"Strategy {i+1} failed with unexpected error: {str(e)}"
                 if "permission" in str(e).lower():
                     error_msg += "\n\nThis appears to be a permission issue. Try selecting a different folder."
@@ -557,11 +697,17 @@ class MyGUI:
                 
                 if i == len(download_strategies) - 1:  # Last strategy
                     error_msg += "\n\nAll download methods failed. This might be due to:\n- Unsupported audio format\n- Corrupted download\n- Insufficient disk space\n- Permission issues\n- YouTube authentication issues"
-                    messagebox.showerror("Error", error_msg)
+                    self.show_error("Error", error_msg, job)
                     logger.error(f"All download strategies failed for {video_url}")
                 else:
                     continue  # Try next strategy
                     
+        if cancel_token.cancelled:
+            # Remove .part files and sources the cancelled download left behind
+            cancel_token.cleanup()
+        if job is not None:
+            return False
+
         # Cleanup after all strategies are tried
         self.progressbar.stop()
         self.progressbar['value'] = 0
@@ -569,83 +715,89 @@ class MyGUI:
         self.cancel_download = False
         self.cancel_button.config(state="disabled")
         self.download_button.config(state="normal")
-        self.update_progress('status', text="Ready")
+        self.update_progress('status', text="Ready", job=job)
+
+    def build_engine(self, quality):
+        """Download engine with the playlist and tagging options chosen in the window"""
+        return DownloadEngine(
+            quality,
+            tag_mode='ffmpeg' if self.ffmpeg_tagging.get() else 'mutagen',
+            speed_profile=self.conversion_speed.get(),
+            output_format='original' if self.keep_original_codec.get() else 'mp3',
+            archive=self.download_archive,
+            concurrency=self.playlist_concurrency.get(),
+            fanout=self.playlist_fanout.get()
+        )
+
+    def download_playlist(self, engine, entries, ydl_opts, output_folder, artist, album, cancel_token, store_id,
+                          total=None, job=None):
+        """
+        Streams playlist entries through the engine's download -> transcode -> cover art -> tag
+        pipeline, with several entries in flight at the same time.
+
+        :param engine: DownloadEngine from build_engine.
+        :param entries: Lazy iterator of playlist entries from resolve_playlist.
+        :param ydl_opts: yt-dlp options of the current strategy.
+        :param output_folder: Folder the MP3 files are written to.
+        :param cancel_token: CancelToken of the download the playlist belongs to.
+        :param store_id: Job store ID of that download, for the completed entries.
+        :param total: Number of entries, if known, for the progress bar.
+        :param job: BatchJob the playlist belongs to, if any.
+        """
+        finished = set()
+        # Entries finished before an interruption are skipped when resuming
+        completed_entries = set(self.job_store.get_checkpoint(store_id).get('completed_entries', []))
+        completed_lock = threading.Lock()
+
+        def mark_completed(item):
+            with completed_lock:
+                completed_entries.add(item['info'].get('id'))
+                self.job_store.checkpoint(store_id, completed_entries=sorted(filter(None, completed_entries)))
 
-    def progress_hook(self, d):
-        """Progress hook for yt-dlp to update progress bar"""
+        def on_entry_status(state, total):
+            if state['status'] in ('completed', 'error'):
+                finished.add(state['index'])
+            count = max(total or 0, state['index'])
+            self.update_progress('progress', value=len(finished) * 100 / count, job=job)
+            self.update_progress('status', text=f"Track {state['index']} ({len(finished)}/{count} done): {state['stage'] or 'queued'}...", job=job)
+
+        if engine.fanout:
+            self.update_progress('status', text="Reading playlist...", job=job)
+        return engine.run_playlist(
+            entries, ydl_opts, output_folder, artist, album, cancel_token, total,
+            skip=lambda item: item['entry'].get('id') in completed_entries,
+            on_finished=mark_completed,
+            on_entry_status=on_entry_status
+        )
+
+    def progress_hook(self, d, cancel_token, job=None):
+        """Progress hook for yt-dlp to update the progress bar of the download or batch job"""
+        # Abort the transfer itself, not just the next strategy
+        cancel_token.progress_hook(d)
+        estimator = job.speed if job is not None else self.download_speed
         if d['status'] == 'downloading':
-            if 'total_bytes' in d and d['total_bytes']:
-                percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                self.update_progress('progress', value=percent)
-                self.update_progress('status', text=f"Downloading... {percent:.1f}%")
-            elif 'total_bytes_estimate' in d and d['total_bytes_estimate']:
-                percent = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                self.update_progress('progress', value=percent)
-                self.update_progress('status', text=f"Downloading... {percent:.1f}%")
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            speed = estimator.update(downloaded)
+            rate = format_rate(speed, estimator.eta(downloaded, total))
+            rate = f" ({rate})" if rate else ""
+            if total:
+                percent = (downloaded / total) * 100
+                self.update_progress('progress', value=percent, job=job)
+                self.update_progress('status', text=f"Downloading... {percent:.1f}%{rate}", job=job)
             elif 'downloaded_bytes' in d:
                 # For HLS or unknown total size, show downloaded amount
-                downloaded_mb = d['downloaded_bytes'] / (1024 * 1024)
-                self.update_progress('status', text=f"Downloading... {downloaded_mb:.1f} MB")
+                downloaded_mb = downloaded / (1024 * 1024)
+                self.update_progress('status', text=f"Downloading... {downloaded_mb:.1f} MB{rate}", job=job)
         elif d['status'] == 'finished':
-            self.update_progress('status', text="Converting to MP3...")
+            estimator.reset()
+            self.update_progress('status', text="Converting to MP3...", job=job)
             # Reset progress bar for conversion phase
-            self.update_progress('progress', value=0)
+            self.update_progress('progress', value=0, job=job)
         elif d['status'] == 'postprocessing':
-            self.update_progress('status', text="Processing audio...")
+            self.update_progress('status', text="Processing audio...", job=job)
             # Show some progress during postprocessing
-            self.update_progress('progress', value=50)
-
-    def save_thumbnail(self, info, filename):
-        """
-        Downloads a thumbnail image from a URL and saves it to the selected download folder.
-
-        :param info: Dictionary containing video information (including the thumbnail URL).
-        :return: Path to the saved thumbnail file (or None if failed).
-        """
-        
-        try:
-            if "thumbnail" in info:
-                thumbnail_url = info["thumbnail"]
-                thumbnail_name = f"{info['title']}.jpg"
-                thumbnail_name = thumbnail_name.replace(" ", "_")
-                thumbnail_path = os.path.join(self.download_directory, thumbnail_name)
-
-                thumbnail = requests.get(thumbnail_url, stream=True)
-                if thumbnail.status_code == 200:
-                    with open(thumbnail_path, "wb") as file:
-                        for chunk in thumbnail.iter_content(1024):
-                            file.write(chunk)
-                    
-                    # Resize the image to max 500x500 pixels
-                    img = Image.open(thumbnail_path)
-                    img.thumbnail((500, 500))
-                    img.save(thumbnail_path, "JPEG", quality=85)
-
-                    logger.info(f"Thumbnail saved and resized: {thumbnail_path}")
-                    audio_file = MP3(filename, ID3=ID3)
-                    # Ensure the file has ID3 tags
-                    try:
-                        audio_file.add_tags()
-                    except Exception:
-                        pass
-                    with open(thumbnail_path, "rb") as img:
-                        audio_file.tags.add(
-                            APIC(
-                                encoding=3, 
-                                mime="image/jpeg",
-                                type=3,  
-                                desc="Cover",
-                                data=img.read(),
-                            )
-                        )
-                    audio_file.save(v2_version=3)
-                    os.remove(thumbnail_path)
-        except Exception as e:
-            logger.error(f"Failed to save thumbnail: {e}")
-            return None
-
-                
-
+            self.update_progress('progress', value=50, job=job)
 
     def set_destination_folder(self):
         """
@@ -678,15 +830,32 @@ class MyGUI:
         self.progressbar['value'] = 0
         self.downloading = True
         self.cancel_download = False
+        # Workers get this token and store ID passed in, a new download replaces the attribute
+        self.cancel_token = cancel_token = CancelToken()
         self.cancel_button.config(state="normal")
         self.download_button.config(state="disabled")
         self.update_progress('status', text="Starting download...")
-        download_thread = threading.Thread(target=self.download_audio, args=(video_url, self.download_directory, artist, album))
-        download_thread.start() 
+        store_id = uuid.uuid4().hex
+        self.job_store.create(store_id, {'status': 'downloading'},
+                              {'url': video_url, 'folder': self.download_directory, 'artist': artist, 'album': album})
+        download_thread = threading.Thread(target=self.run_single_download,
+                                           args=(video_url, self.download_directory, artist, album, cancel_token, store_id))
+        download_thread.start()
+
+    def run_single_download(self, video_url, output_folder, artist, album, cancel_token, store_id):
+        """Worker thread of the main download, records the outcome for resuming"""
+        succeeded = False
+        try:
+            succeeded = self.download_audio(video_url, output_folder, artist, album,
+                                            cancel_token=cancel_token, store_id=store_id)
+        finally:
+            state = 'cancelled' if cancel_token.cancelled else 'completed' if succeeded else 'error'
+            self.job_store.put(store_id, {'status': state})
             
     def cancel_download_process(self):
-        """Cancel ongoing download"""
+        """Cancel ongoing download, stopping yt-dlp at its next block and killing FFmpeg"""
         self.cancel_download = True
+        self.cancel_token.cancel()
         self.downloading = False
         self.cancel_button.config(state="disabled")
         self.download_button.config(state="normal")
@@ -703,12 +872,181 @@ class MyGUI:
         self.url_entry.delete(0, tk.END)
         self.destination_text.config(text="please select a folder")
 
+    def load_batch_file(self):
+        """Append the URLs of a text file to the batch input"""
+        path = filedialog.askopenfilename(title="Select URL List", filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.batch_text.insert(tk.END, f.read().strip() + "\n")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not read {path}: {e}")
+
+    def add_batch_jobs(self):
+        """Queue every URL of the batch input as its own job"""
+        if not self.download_directory:
+            messagebox.showerror("Error", "Please select a destination folder.")
+            return
+        urls = []
+        invalid = 0
+        for line in self.batch_text.get("1.0", tk.END).splitlines():
+            url = line.strip()
+            if not url or url.startswith('#'):
+                continue
+            if self.is_valid_youtube_url(url):
+                urls.append(url)
+            else:
+                invalid += 1
+        if invalid:
+            messagebox.showwarning("Warning", f"Skipped {invalid} invalid URL(s).")
+        if not urls:
+            return
+
+        self.batch_text.delete("1.0", tk.END)
+        artist = self.artist_entry.get().strip()
+        album = self.album_entry.get().strip()
+        for url in dict.fromkeys(urls):
+            self.batch_counter += 1
+            job = BatchJob(self.batch_counter, url, self.download_directory, artist, album)
+            self.job_store.create(job.store_id, {'status': 'queued'},
+                                  {'url': url, 'folder': job.folder, 'artist': artist, 'album': album})
+            self.batch_jobs[job.id] = job
+            self.add_job_row(job)
+        self.dispatch_batch_jobs()
+
+    def resume_interrupted_jobs(self):
+        """Offer to resume downloads that did not finish in the last session"""
+        interrupted = [(store_id, request) for store_id, record, request in self.job_store.unfinished() if request]
+        if not interrupted:
+            return
+        if not messagebox.askyesno("Resume?", f"{len(interrupted)} download(s) were interrupted.\nResume them?"):
+            for store_id, request in interrupted:
+                self.job_store.put(store_id, {'status': 'cancelled'})
+            return
+        for store_id, request in interrupted:
+            self.batch_counter += 1
+            job = BatchJob(self.batch_counter, request['url'], request['folder'],
+                           request['artist'], request['album'], store_id=store_id)
+            self.batch_jobs[job.id] = job
+            self.add_job_row(job)
+        logger.info(f"Resuming {len(interrupted)} interrupted download(s)")
+        self.dispatch_batch_jobs()
+
+    def add_job_row(self, job):
+        row = tk.Frame(self.batch_frame, bg="#BFBFBF")
+        row.pack(fill="x", pady=1)
+        label = job.url if len(job.url) <= 32 else job.url[:29] + "..."
+        tk.Label(row, text=f"{job.id}. {label}", bg="#BFBFBF", fg="black", width=30, anchor="w").pack(side="left")
+        progressbar = ttk.Progressbar(row, orient="horizontal", length=80, mode="determinate", style="TProgressbar")
+        progressbar.pack(side="left", padx=2)
+        status = tk.Label(row, text="Waiting", bg="#BFBFBF", fg="black", width=18, anchor="w")
+        status.pack(side="left", padx=2)
+        cancel = tk.Button(row, text="✕", bg="#D4D0C8", fg="black", relief="ridge",
+                           command=lambda: self.cancel_batch_job(job.id))
+        cancel.pack(side="left")
+        self.batch_rows[job.id] = {'frame': row, 'progress': progressbar, 'status': status, 'cancel': cancel}
+
+    def dispatch_batch_jobs(self):
+        """Start pending jobs until the number of parallel jobs is reached"""
+        running = sum(1 for job in self.batch_jobs.values() if job.state == 'running')
+        for job in self.batch_jobs.values():
+            if running >= self.batch_concurrency.get():
+                break
+            if job.state != 'pending':
+                continue
+            job.state = 'running'
+            running += 1
+            if self.batch_started is None:
+                self.batch_started = time.monotonic()
+            self.batch_rows[job.id]['status'].config(text="Starting...")
+            threading.Thread(target=self.run_batch_job, args=(job,), daemon=True).start()
+
+    def run_batch_job(self, job):
+        """Worker thread of one batch job"""
+        try:
+            succeeded = self.download_audio(job.url, job.folder, job.artist, job.album, job=job)
+        except Exception as e:
+            logger.error(f"Batch job {job.id} failed: {e}")
+            job.error = str(e)
+            succeeded = False
+        state = 'cancelled' if job.cancelled else 'completed' if succeeded else 'error'
+        self.job_store.put(job.store_id, {'status': state, 'error': job.error})
+        self.update_progress('state', job=job, value=state)
+
+    def apply_job_update(self, job_id, kind, values):
+        """Show an update of a batch job in its row (UI thread)"""
+        job = self.batch_jobs.get(job_id)
+        row = self.batch_rows.get(job_id)
+        if job is None or row is None:
+            return
+        if kind == 'progress':
+            row['progress']['value'] = values['value']
+        elif kind == 'status' and job.state == 'running':
+            row['status'].config(text=values['text'])
+        elif kind == 'state':
+            job.state = values['value']
+            job.speed.reset()
+            if job.state == 'completed':
+                row['progress']['value'] = 100
+                row['status'].config(text="Done")
+            elif job.state == 'cancelled':
+                row['status'].config(text="Cancelled")
+            else:
+                row['status'].config(text=job.error or "Failed")
+            row['cancel'].config(state="disabled")
+            self.dispatch_batch_jobs()
+
+    def cancel_batch_job(self, job_id):
+        """Cancel a waiting or running batch job"""
+        job = self.batch_jobs.get(job_id)
+        if job is None or job.state in BATCH_DONE_STATES:
+            return
+        job.cancel_token.cancel()
+        # Persist right away, so a restart never offers to resume a cancelled download
+        self.job_store.put(job.store_id, {'status': 'cancelled'})
+        row = self.batch_rows[job_id]
+        row['cancel'].config(state="disabled")
+        if job.state == 'pending':
+            job.state = 'cancelled'
+            row['status'].config(text="Cancelled")
+        else:
+            row['status'].config(text="Cancelling...")
+
+    def clear_finished_jobs(self):
+        """Remove the rows of finished batch jobs"""
+        for job_id in [job.id for job in self.batch_jobs.values() if job.state in BATCH_DONE_STATES]:
+            self.batch_rows.pop(job_id)['frame'].destroy()
+            self.job_store.delete(self.batch_jobs.pop(job_id).store_id)
+        if not self.batch_jobs:
+            self.batch_started = None
+            self.throughput_label.config(text="")
+
+    def update_throughput(self):
+        """Show the combined speed and the number of finished batch jobs"""
+        if not self.batch_jobs:
+            return
+        running = [job for job in self.batch_jobs.values() if job.state == 'running']
+        done = sum(1 for job in self.batch_jobs.values() if job.state == 'completed')
+        speed = sum(job.speed.speed or 0 for job in running)
+        text = f"{done}/{len(self.batch_jobs)} done, {len(running)} running"
+        if speed:
+            text += f", {format_rate(speed, None)}"
+        if self.batch_started is not None and done:
+            per_minute = done * 60 / max(1.0, time.monotonic() - self.batch_started)
+            text += f", {per_minute:.1f} jobs/min"
+        if self.throughput_label.cget('text') != text:
+            self.throughput_label.config(text=text)
+
     def on_closing(self):
         """
         Confirm the user wants to quit the application.
         """
         if messagebox.askyesno("Quit?", "Are you sure you want to quit?"):
             self.root.destroy()
+            http_pool.log_stats()
+            logger.info(f"YoutubeDL pool: {shared_pool.stats()}")
+            shared_pool.close()
             logger.info("Application closed on user request.")
 
     def check_available_formats(self):
@@ -742,6 +1080,7 @@ class MyGUI:
                 # Basic yt-dlp options for format checking
                 ydl_opts = {
                     'quiet': True,
+                    'socket_timeout': SOCKET_TIMEOUT,
                     'no_warnings': False,
                     'extract_flat': False,
                     'extractor_args': {
@@ -758,9 +1097,8 @@ class MyGUI:
                     cookie_path = self.cookie_file_path.get()
                     if cookie_path:
                         try:
-                            with open(cookie_path, 'r') as f:
-                                cookie_data = f.read()
-                            ydl_opts['cookies'] = cookie_data
+                            cookie_jars.get_jar(cookie_path)
+                            ydl_opts['cookiefile'] = cookie_path
                             logger.info(f"Using cookie file for format check: {cookie_path}")
                         except FileNotFoundError:
                             error_msg = f"Cookie file not found at: {cookie_path}\nPlease select a valid cookie file."
@@ -781,9 +1119,9 @@ class MyGUI:
                     logger.info(f"Checking formats with {client} client (no cookies)")
                 
                 try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                        # Get video info without downloading
-                        info = ydl.extract_info(video_url, download=False)
+                    with shared_pool.checkout(ydl_opts) as ydl:
+                        # Get video info without downloading, reusing a cached extraction
+                        info = ydl.process_ie_result(extract_info_cached(ydl, video_url, client), download=False)
                         if info:
                             all_formats_info.append((client, info))
                 except Exception as e:
@@ -795,6 +1133,7 @@ class MyGUI:
                 # Fallback: try without client specification
                 ydl_opts = {
                     'quiet': True,
+                    'socket_timeout': SOCKET_TIMEOUT,
                     'no_warnings': False,
                     'extract_flat': False,
                 }
@@ -804,14 +1143,13 @@ class MyGUI:
                     cookie_path = self.cookie_file_path.get()
                     if cookie_path:
                         try:
-                            with open(cookie_path, 'r') as f:
-                                cookie_data = f.read()
-                            ydl_opts['cookies'] = cookie_data
-                        except:
+                            cookie_jars.get_jar(cookie_path)
+                            ydl_opts['cookiefile'] = cookie_path
+                        except (OSError, cookie_jars.CookieFileError):
                             pass
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
+                with shared_pool.checkout(ydl_opts) as ydl:
+                    info = ydl.process_ie_result(extract_info_cached(ydl, video_url), download=False)
                     if info:
                         all_formats_info.append(('default', info))
             
@@ -951,6 +1289,7 @@ class MyGUI:
             
             ydl_opts = {
                 'quiet': True,
+                'socket_timeout': SOCKET_TIMEOUT,
                 'no_warnings': False,
                 'extract_flat': False,
             }
@@ -963,9 +1302,8 @@ class MyGUI:
                 cookie_path = self.cookie_file_path.get()
                 if cookie_path:
                     try:
-                        with open(cookie_path, 'r') as f:
-                            cookie_data = f.read()
-                        ydl_opts['cookies'] = cookie_data
+                        cookie_jars.get_jar(cookie_path)
+                        ydl_opts['cookiefile'] = cookie_path
                         logger.info(f"Testing YouTube access with cookie file: {cookie_path}")
                     except Exception as e:
                         logger.error(f"Failed to read cookie file: {e}")
@@ -975,7 +1313,7 @@ class MyGUI:
             else:
                 logger.info("Testing YouTube access without cookies")
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with shared_pool.checkout(ydl_opts) as ydl:
                 # Just try to get video info
                 info = ydl.extract_info(test_url, download=False)
                 
@@ -1327,4 +1665,6 @@ class MyGUI:
         """
         self.main_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
 
-myapp = MyGUI()
+
+if __name__ == "__main__":
+    myapp = MyGUI()
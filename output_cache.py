@@ -0,0 +1,170 @@
+"""
+Content-addressed cache of finished MP3 files.
+
+Entries are keyed by video ID, quality and encoder settings. Files enter and
+leave the cache as a reflink (copy-on-write clone) or, where the file system
+has none, a plain copy. Hardlinks are never used: a tag editor writing to one
+user's MP3 in place would change the cached file and every copy made from it.
+The cache is bounded by size and evicts the least recently used files first.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ioctl request for FICLONE (Linux copy-on-write clone, e.g. btrfs, xfs)
+FICLONE = 0x40049409
+
+
+def _reflink(source, target):
+    """Clone source into target without copying data, raises OSError if unsupported"""
+    import fcntl
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+class OutputCache:
+    """
+    Size-bounded LRU cache of converted files.
+
+    :param cache_dir: Directory holding the files and index.json.
+    :param max_bytes: Maximum total size of cached files.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(video_id, quality, codec='mp3', settings=''):
+        """Return the cache key for a video converted with the given settings"""
+        raw = f"{video_id}|{quality}|{codec}|{settings}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, key):
+        """Return the metadata of a cached entry and count a hit or miss, or None"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry and not os.path.exists(self._blob_path(key, entry)):
+                del self._index[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry['last_used'] = time.time()
+            self._save_index_locked()
+            return dict(entry['metadata'])
+
+    def store(self, key, source_path, metadata):
+        """
+        Add a finished file to the cache.
+
+        :param metadata: JSON-serialisable dict stored with the file (title, tags, filename, ...).
+        """
+        ext = os.path.splitext(source_path)[1]
+        with self._lock:
+            entry = {'ext': ext, 'size': os.path.getsize(source_path),
+                     'last_used': time.time(), 'metadata': metadata}
+            blob_path = self._blob_path(key, entry)
+            try:
+                self._place(source_path, blob_path)
+            except OSError as e:
+                logger.warning(f"Could not add {source_path} to output cache: {e}")
+                return
+            self._index[key] = entry
+            self._evict_locked()
+            self._save_index_locked()
+        logger.info(f"Stored {source_path} in output cache")
+
+    def materialize(self, key, target_path):
+        """
+        Place a cached file at target_path.
+
+        The placed file shares no storage with the cache that a write could
+        reach, so the caller may modify it (e.g. different tags).
+
+        :return: target_path, or None if the entry is gone.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            blob_path = self._blob_path(key, entry)
+        try:
+            if os.stat(blob_path).st_nlink > 1:
+                # Hardlinked into a download folder by an older version, give the cache its own inode
+                self._place(blob_path, blob_path)
+            self._place(blob_path, target_path)
+        except FileNotFoundError:
+            return None
+        return target_path
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._index),
+                'bytes': sum(entry['size'] for entry in self._index.values()),
+                'max_bytes': self.max_bytes
+            }
+
+    def _place(self, source, target):
+        # Build next to the target, then swap in atomically
+        temp_path = target + ".cache.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            try:
+                _reflink(source, temp_path)
+            except (OSError, ImportError):
+                shutil.copyfile(source, temp_path)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _blob_path(self, key, entry):
+        return os.path.join(self.cache_dir, key + entry['ext'])
+
+    def _evict_locked(self):
+        total = sum(entry['size'] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(key, entry))
+            except FileNotFoundError:
+                pass
+            total -= entry['size']
+            del self._index[key]
+            logger.info(f"Evicted {key} from output cache")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Could not read output cache index: {e}")
+            return {}
+
+    def _save_index_locked(self):
+        temp_path = self._index_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(temp_path, self._index_path)
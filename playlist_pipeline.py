@@ -0,0 +1,179 @@
+"""
+Streaming pipeline for playlist entries.
+
+Instead of downloading a whole playlist first and tagging afterwards, every
+entry runs through its own chain of stages (download, transcode, tag, cover
+art). Finished tracks show up while later entries are still downloading.
+At most `max_in_flight` entries are processed at the same time, and single
+stages can be limited further (e.g. FFmpeg).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import urlparse
+
+from info_cache import extract_info_cached
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_TYPES = ('playlist', 'multi_video')
+
+
+class HostLimiter:
+    """
+    Limits how many entries talk to the same host at once.
+
+    :param per_host: Maximum concurrent stage runs per host.
+    """
+
+    def __init__(self, per_host=4):
+        self.per_host = max(1, per_host)
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        """Return the semaphore guarding the host of url"""
+        host = urlparse(url).hostname if url and '://' in url else None
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+
+class PipelineStage:
+    """
+    One step of the per-entry pipeline.
+
+    :param name: Name reported in the entry status (e.g. 'download').
+    :param func: Callable receiving the entry's work item dict. It reads the
+        results of earlier stages from the dict and stores its own there.
+    :param limit: Optional maximum number of entries in this stage at once.
+        Pass a semaphore instead of a number to share the limit between
+        pipelines (e.g. a global download limit across all jobs).
+    :param host_limiter: Optional HostLimiter applied to the entry URL.
+    """
+
+    def __init__(self, name, func, limit=None, host_limiter=None):
+        self.name = name
+        self.func = func
+        if isinstance(limit, int):
+            self.slots = threading.BoundedSemaphore(limit)
+        else:
+            self.slots = limit
+        self.host_limiter = host_limiter
+
+
+def resolve_playlist(ydl, url, client='default'):
+    """
+    Extract a URL without resolving its playlist entries.
+
+    Single videos are served from the info cache when possible.
+
+    :param client: player_client of ydl, part of the info cache key.
+    :return: Tuple (info, entries). entries is a lazy iterator of the playlist
+        entries, or None if the URL points to a single video.
+    """
+    info = extract_info_cached(ydl, url, client)
+    # Follow redirects such as watch?v=...&list=... -> playlist page
+    for _ in range(3):
+        if info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+    if info.get('_type') in PLAYLIST_TYPES:
+        return info, (entry for entry in info.get('entries') or [] if entry)
+    return info, None
+
+
+def fan_out(entries):
+    """
+    Flat-extract the complete entry list at once.
+
+    The entries from resolve_playlist are unresolved URL results, so this only
+    walks the playlist pages. Knowing all entries up front gives an exact
+    total for progress reporting and lets every entry start right away.
+    """
+    return list(entries)
+
+
+def entry_url(entry):
+    """Return a URL that yt-dlp can extract for a (flat) playlist entry"""
+    return entry.get('webpage_url') or entry.get('url') or entry.get('id')
+
+
+class PlaylistPipeline:
+    """
+    Runs playlist entries through a list of PipelineStage objects.
+
+    :param stages: Stages every entry passes, in order.
+    :param max_in_flight: Maximum number of entries processed concurrently.
+    :param on_entry_status: Optional callback receiving a copy of an entry's
+        status dict whenever it changes.
+    :param should_cancel: Optional callable; when it returns True no further
+        entries are started.
+    """
+
+    def __init__(self, stages, max_in_flight=3, on_entry_status=None, should_cancel=None):
+        self.stages = stages
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_entry_status = on_entry_status
+        self.should_cancel = should_cancel or (lambda: False)
+        self._lock = threading.Lock()
+
+    def run(self, entries):
+        """
+        Process entries as they arrive from the (lazy) iterator.
+
+        :return: List of status dicts, one per started entry, in playlist order.
+        """
+        states = []
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="playlist") as pool:
+            for index, entry in enumerate(entries, start=1):
+                in_flight.acquire()
+                if self.should_cancel():
+                    in_flight.release()
+                    break
+                state = {
+                    'index': index,
+                    'id': entry.get('id'),
+                    'title': entry.get('title') or entry_url(entry),
+                    'stage': None,
+                    'status': 'pending',
+                }
+                states.append(state)
+                self._report(state)
+                future = pool.submit(self._process, {'index': index, 'entry': entry}, state)
+                future.add_done_callback(lambda _: in_flight.release())
+        return states
+
+    def _process(self, item, state):
+        for stage in self.stages:
+            if self.should_cancel():
+                self._set(state, status='cancelled')
+                return
+            self._set(state, stage=stage.name, status='running')
+            try:
+                with ExitStack() as stack:
+                    if stage.slots:
+                        stack.enter_context(stage.slots)
+                    if stage.host_limiter:
+                        stack.enter_context(stage.host_limiter.slot(entry_url(item['entry'])))
+                    stage.func(item)
+            except Exception as e:
+                logger.warning(f"Playlist entry {state['index']} failed in stage {stage.name}: {e}")
+                self._set(state, status='error', error=str(e))
+                return
+        self._set(state, status='completed', title=item.get('title', state['title']))
+
+    def _set(self, state, **fields):
+        with self._lock:
+            state.update(fields)
+        self._report(state)
+
+    def _report(self, state):
+        if self.on_entry_status:
+            try:
+                self.on_entry_status(dict(state))
+            except Exception as e:
+                logger.error(f"Entry status callback failed: {e}")
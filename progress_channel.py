@@ -0,0 +1,87 @@
+"""
+Coalescing progress channel between worker threads and the Tk main loop.
+
+Workers post updates as often as they like; only the latest value per job and
+kind ('progress', 'status', ...) is kept. The UI drains the channel at a fixed
+frame rate and applies each changed value once, so a download reporting
+hundreds of times per second costs at most one widget update per frame.
+"""
+import threading
+import time
+
+# Target UI refresh rate in frames per second
+UI_FPS = 20
+
+
+class ProgressChannel:
+    """Thread-safe latest-value store, drained by the UI thread"""
+
+    def __init__(self):
+        self._pending = {}  # (job_id, kind) -> values, insertion order kept
+        self._lock = threading.Lock()
+
+    def post(self, kind, job_id=None, **values):
+        """Replace the pending update of this job and kind"""
+        with self._lock:
+            key = (job_id, kind)
+            # Move to the end so the UI applies updates in the order they happened
+            self._pending.pop(key, None)
+            self._pending[key] = values
+
+    def drain(self):
+        """Return and clear all pending updates as a list of (job_id, kind, values)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return [(job_id, kind, values) for (job_id, kind), values in pending.items()]
+
+
+class SpeedEstimator:
+    """
+    Exponentially smoothed transfer speed and ETA.
+
+    :param alpha: Weight of the newest sample (0..1); lower values smooth more.
+    :param min_sample: Minimum seconds between two samples, shorter gaps are merged.
+    """
+
+    def __init__(self, alpha=0.3, min_sample=0.2):
+        self.alpha = alpha
+        self.min_sample = min_sample
+        self.reset()
+
+    def reset(self):
+        self.speed = None
+        self._last_time = None
+        self._last_bytes = 0
+
+    def update(self, downloaded_bytes, now=None):
+        """Add a sample and return the smoothed speed in bytes per second, or None"""
+        now = time.monotonic() if now is None else now
+        if self._last_time is None or downloaded_bytes < self._last_bytes:
+            self._last_time = now
+            self._last_bytes = downloaded_bytes
+            return self.speed
+        elapsed = now - self._last_time
+        if elapsed < self.min_sample:
+            return self.speed
+        sample = (downloaded_bytes - self._last_bytes) / elapsed
+        self.speed = sample if self.speed is None else self.alpha * sample + (1 - self.alpha) * self.speed
+        self._last_time = now
+        self._last_bytes = downloaded_bytes
+        return self.speed
+
+    def eta(self, downloaded_bytes, total_bytes):
+        """Return the remaining seconds, or None if unknown"""
+        if not total_bytes or not self.speed:
+            return None
+        return max(0.0, (total_bytes - downloaded_bytes) / self.speed)
+
+
+def format_rate(speed, eta):
+    """Format speed and ETA like '3.2 MB/s, ETA 0:12'"""
+    parts = []
+    if speed:
+        parts.append(f"{speed / (1024 * 1024):.1f} MB/s")
+    if eta is not None:
+        minutes, seconds = divmod(int(eta), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return ", ".join(parts)
@@ -0,0 +1,120 @@
+"""
+Push channel for job progress.
+
+Every change of a job record is published to an EventBroker; clients
+subscribe to one or several job IDs and receive the records as Server-Sent
+Events instead of polling /status. ProgressHook turns the yt-dlp progress
+callbacks into rate-limited byte/percent/ETA updates.
+"""
+import json
+import queue
+import threading
+import time
+
+
+class Subscription:
+    """Queue of (job_id, record) events for a set of job IDs"""
+
+    def __init__(self, job_ids):
+        self.job_ids = set(job_ids)
+        self._queue = queue.Queue()
+
+    def push(self, job_id, record):
+        self._queue.put((job_id, record))
+
+    def get(self, timeout=None):
+        """Return the next (job_id, record), or None after timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Fan-out of job records to the subscriptions interested in them"""
+
+    def __init__(self):
+        self._subscriptions = {}  # job_id -> set of Subscription
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_ids):
+        subscription = Subscription(job_ids)
+        with self._lock:
+            for job_id in subscription.job_ids:
+                self._subscriptions.setdefault(job_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for job_id in subscription.job_ids:
+                subscribers = self._subscriptions.get(job_id)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[job_id]
+
+    def publish(self, job_id, record):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(job_id, ()))
+        for subscription in subscribers:
+            subscription.push(job_id, dict(record))
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+
+def sse_message(data, event=None):
+    """Format one Server-Sent Event"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ProgressHook:
+    """
+    yt-dlp progress hook that reports at most every min_interval seconds.
+
+    The 'finished' callback of a file is always reported.
+
+    :param callback: Called with a dict (phase, downloaded_bytes, total_bytes,
+        percent, speed, eta, filename, tmpfilename, format_id).
+    :param min_interval: Minimum seconds between two reports while downloading.
+    """
+
+    def __init__(self, callback, min_interval=0.5):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._last_report = 0.0
+
+    def __call__(self, d):
+        status = d.get('status')
+        if status not in ('downloading', 'finished'):
+            return
+        now = time.monotonic()
+        if status == 'downloading' and now - self._last_report < self.min_interval:
+            return
+        self._last_report = now
+
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if status == 'finished':
+            percent = 100.0
+        elif total:
+            percent = min(100.0, downloaded * 100.0 / total)
+        else:
+            percent = None
+        self.callback({
+            'phase': 'download' if status == 'downloading' else 'downloaded',
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'percent': percent,
+            'speed': d.get('speed'),
+            'eta': d.get('eta'),
+            'filename': d.get('filename'),
+            'tmpfilename': d.get('tmpfilename'),
+            'format_id': (d.get('info_dict') or {}).get('format_id'),
+        })
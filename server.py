@@ -5,14 +5,23 @@ Bietet eine REST API für die YouTube-zu-MP3 Konvertierung
 import os
 import logging
 import threading
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import yt_dlp
-from mutagen.easyid3 import EasyID3
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC
-import requests
-from PIL import Image
+import http_pool
+from cancellation import CancelToken
+from download_archive import DownloadArchive
+from job_scheduler import JobScheduler, QueueFullError
+from job_store import MemoryJobStore, SQLiteJobStore, FINISHED_STATES
+from lazy_imports import preload_in_background
+from library_sync import plan_sync
+from engine import DownloadEngine
+from playlist_pipeline import HostLimiter, resolve_playlist, entry_url
+from output_cache import OutputCache
+from progress_events import EventBroker, ProgressHook, sse_message
+from strategy_stats import video_id_from_url
+from tagging import write_tags
+from transcoder import OUTPUT_FORMATS, SPEED_PROFILES, TranscodeCancelled, encoder_settings
+from ydl_pool import shared_pool
 
 # Setup Logging
 logging.basicConfig(
@@ -25,8 +34,77 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Erlaube Cross-Origin Requests von der Extension
 
-# Globale Variablen für Download-Status
-download_status = {}
+# Job-Status: SQLite (übersteht Neustarts) oder im Speicher, abgeschlossene Jobs laufen ab
+if os.environ.get('CONVERT2MP3_JOB_STORE', 'sqlite') == 'memory':
+    job_store = MemoryJobStore(ttl=int(os.environ.get('CONVERT2MP3_JOB_TTL', 24 * 3600)))
+else:
+    job_store = SQLiteJobStore(
+        os.environ.get('CONVERT2MP3_JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.db')),
+        ttl=int(os.environ.get('CONVERT2MP3_JOB_TTL', 24 * 3600))
+    )
+
+# Jede Statusänderung wird an die SSE-Abonnenten von /events verteilt
+events = EventBroker()
+job_store.add_listener(events.publish)
+# Sekunden zwischen zwei Fortschrittsmeldungen während eines Downloads
+PROGRESS_INTERVAL = float(os.environ.get('CONVERT2MP3_PROGRESS_INTERVAL', 0.5))
+# Kommentarzeile, damit Proxies eine ruhige SSE-Verbindung nicht schließen
+SSE_KEEPALIVE = 15
+
+# Abbruch-Token laufender Jobs, für DELETE /jobs/<download_id>
+cancel_tokens = {}
+cancel_tokens_lock = threading.Lock()
+# Sekunden, nach denen eine hängende Verbindung abbricht; begrenzt, wie lange ein
+# abgebrochener Download noch blockieren kann
+SOCKET_TIMEOUT = int(os.environ.get('CONVERT2MP3_SOCKET_TIMEOUT', 20))
+# Optionale Cookie-Datei (Netscape-Format); wird einmal eingelesen und von allen
+# YoutubeDL-Instanzen geteilt, Änderungen an der Datei werden übernommen
+COOKIE_FILE = os.environ.get('CONVERT2MP3_COOKIE_FILE') or None
+
+# Begrenzte Worker-Pools für Downloads und FFmpeg statt einem Thread pro Anfrage
+scheduler = JobScheduler(
+    download_workers=int(os.environ.get('CONVERT2MP3_DOWNLOAD_WORKERS', 2)),
+    transcode_workers=int(os.environ.get('CONVERT2MP3_TRANSCODE_WORKERS', os.cpu_count() or 1)),
+    max_queue=int(os.environ.get('CONVERT2MP3_MAX_QUEUE', 100))
+)
+
+# Cache fertiger MP3s: gleiche Videos werden nur einmal geladen und konvertiert
+OUTPUT_CACHE_MAX_MB = int(os.environ.get('CONVERT2MP3_OUTPUT_CACHE_MAX_MB', 2048))
+output_cache = OutputCache(
+    os.environ.get('CONVERT2MP3_OUTPUT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'output_cache')),
+    max_bytes=OUTPUT_CACHE_MAX_MB * 1024 * 1024
+) if OUTPUT_CACHE_MAX_MB > 0 else None
+
+# Archiv fertiger Titel: bei erneutem Lauf einer Playlist werden nur neue Titel geladen
+download_archive = DownloadArchive(
+    os.environ.get('CONVERT2MP3_ARCHIVE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive.db'))
+)
+
+# Anzahl gleichzeitig verarbeiteter Titel einer Playlist
+PLAYLIST_CONCURRENCY = int(os.environ.get('CONVERT2MP3_PLAYLIST_CONCURRENCY', 3))
+
+# Fan-out: Playlist einmal flach auslesen und Titel parallel laden, begrenzt
+# über alle Jobs hinweg und pro Host
+PLAYLIST_FANOUT = os.environ.get('CONVERT2MP3_PLAYLIST_MODE', 'fanout') == 'fanout'
+DOWNLOAD_SLOTS = threading.BoundedSemaphore(int(os.environ.get('CONVERT2MP3_MAX_CONCURRENCY', 8)))
+HOST_LIMITER = HostLimiter(int(os.environ.get('CONVERT2MP3_PER_HOST_LIMIT', 4)))
+
+# 'ffmpeg': Tags und Cover schreibt FFmpeg direkt beim Konvertieren,
+# 'mutagen': nachträglich in einem eigenen Schreibvorgang
+TAG_MODE = os.environ.get('CONVERT2MP3_TAG_MODE', 'mutagen')
+
+# LAME-Profil: 'fast', 'balanced' oder 'quality' (VBR, 44,1 kHz), siehe transcoder.SPEED_PROFILES
+SPEED_PROFILE = os.environ.get('CONVERT2MP3_SPEED_PROFILE', 'balanced')
+if SPEED_PROFILE not in SPEED_PROFILES:
+    raise ValueError(f"Unbekanntes CONVERT2MP3_SPEED_PROFILE: {SPEED_PROFILE}")
+# Teil der Cache-Schlüssel, damit ein anderes Profil nicht alte Dateien liefert
+ENCODER_SETTINGS = encoder_settings(SPEED_PROFILE)
+
+# 'mp3' oder 'original': Opus/M4A-Quellen werden ohne Neukodierung nur umverpackt.
+# MP3-Quellen mit passender Bitrate werden in beiden Fällen nur kopiert
+OUTPUT_FORMAT = os.environ.get('CONVERT2MP3_OUTPUT_FORMAT', 'mp3')
+if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+    raise ValueError(f"Unbekanntes CONVERT2MP3_OUTPUT_FORMAT: {OUTPUT_FORMAT}")
 
 
 def sanitize_filename(filename):
@@ -39,116 +117,397 @@ def sanitize_filename(filename):
     return filename
 
 
-def save_thumbnail(info, filename, download_directory):
-    """Download and embed thumbnail in MP3 file"""
-    try:
-        if "thumbnail" in info:
-            thumbnail_url = info["thumbnail"]
-            thumbnail_name = f"{info['title']}.jpg"
-            thumbnail_name = sanitize_filename(thumbnail_name.replace(" ", "_"))
-            thumbnail_path = os.path.join(download_directory, thumbnail_name)
-
-            thumbnail = requests.get(thumbnail_url, stream=True)
-            if thumbnail.status_code == 200:
-                with open(thumbnail_path, "wb") as file:
-                    for chunk in thumbnail.iter_content(1024):
-                        file.write(chunk)
-                
-                # Resize the image
-                img = Image.open(thumbnail_path)
-                img.thumbnail((500, 500))
-                img.save(thumbnail_path, "JPEG", quality=85)
-
-                logger.info(f"Thumbnail saved: {thumbnail_path}")
-                audio_file = MP3(filename, ID3=ID3)
-                try:
-                    audio_file.add_tags()
-                except Exception:
-                    pass
-                with open(thumbnail_path, "rb") as img:
-                    audio_file.tags.add(
-                        APIC(
-                            encoding=3,
-                            mime="image/jpeg",
-                            type=3,
-                            desc="Cover",
-                            data=img.read(),
-                        )
-                    )
-                audio_file.save(v2_version=3)
-                os.remove(thumbnail_path)
-                return True
-    except Exception as e:
-        logger.error(f"Failed to save thumbnail: {e}")
-    return False
+def tag_audio_file(filename, artist, album, title, cover=None):
+    """Write artist, album, title and the cover in a single save"""
+    write_tags(filename, artist or "Unknown", album or "Unknown", title or "Unknown Title", cover)
+
+
+def job_engine(quality):
+    """Download engine with the server settings; FFmpeg runs on the transcode pool"""
+    return DownloadEngine(
+        quality,
+        tag_mode=TAG_MODE,
+        speed_profile=SPEED_PROFILE,
+        output_format=OUTPUT_FORMAT,
+        archive=download_archive,
+        concurrency=PLAYLIST_CONCURRENCY,
+        fanout=PLAYLIST_FANOUT,
+        download_slots=DOWNLOAD_SLOTS,
+        host_limiter=HOST_LIMITER,
+        transcode_workers=scheduler.transcode_workers,
+        run_transcode=scheduler.run_transcode
+    )
+
 
+def cancel_token_for(download_id):
+    """Return the cancel token of a job (a fresh one if the job has none)"""
+    with cancel_tokens_lock:
+        return cancel_tokens.setdefault(download_id, CancelToken())
 
-def download_audio_async(video_url, output_folder, artist, album, quality, download_id):
-    """Download audio in a separate thread"""
+
+def release_cancel_token(download_id):
+    with cancel_tokens_lock:
+        cancel_tokens.pop(download_id, None)
+
+
+def finish_cancelled(download_id, cancel_token):
+    """Remove partial files of a cancelled job and mark it as cancelled"""
+    cancel_token.cleanup()
+    release_cancel_token(download_id)
+    job_store.put(download_id, {
+        'status': 'cancelled',
+        'progress': 0,
+        'message': 'Abgebrochen'
+    })
+    logger.info(f"Job {download_id} cancelled")
+
+
+def restore_from_cache(video_id, output_folder, artist, album, quality):
+    """
+    Place a cached conversion of a video into output_folder.
+
+    :return: Path of the MP3 file, or None on a cache miss.
+    """
+    if output_cache is None or not video_id:
+        return None
+    key = OutputCache.key(video_id, quality, OUTPUT_FORMAT, ENCODER_SETTINGS)
+    metadata = output_cache.lookup(key)
+    if metadata is None:
+        return None
+    
+    # Eigene Kopie (Reflink oder Kopie), Tag-Änderungen erreichen den Cache nicht
+    same_tags = metadata.get('artist') == (artist or "Unknown") and metadata.get('album') == (album or "Unknown")
+    filename = output_cache.materialize(key, os.path.join(output_folder, metadata['filename']))
+    if filename and not same_tags:
+        tag_audio_file(filename, artist, album, metadata.get('title'))
+    if filename:
+        logger.info(f"Served {video_id} from output cache: {filename}")
+    return filename
+
+
+def add_to_cache(info, filename, artist, album, quality):
+    """Store a finished MP3 in the output cache"""
+    if output_cache is None or not info.get('id'):
+        return
+    output_cache.store(OutputCache.key(info['id'], quality, OUTPUT_FORMAT, ENCODER_SETTINGS), filename, {
+        'filename': os.path.basename(filename),
+        'title': info.get('title'),
+        'artist': artist or "Unknown",
+        'album': album or "Unknown"
+    })
+
+
+def download_audio_async(video_url, output_folder, artist, album, quality, download_id, sync=False):
+    """
+    Download stage: fetch the source audio with yt-dlp on a download worker.
+
+    Playlists are streamed entry by entry through download_playlist and
+    finish on this worker.
+
+    :param sync: Only download the entries of the playlist or channel that are
+        not yet in output_folder (see library_sync.plan_sync).
+
+    :return: List of (info, source_path) tuples for the transcode stage, or None
+        if there is nothing left to transcode.
+    """
+    cancel_token = cancel_token_for(download_id)
+    checkpoint = job_store.get_checkpoint(download_id)
     try:
+        cancel_token.raise_if_cancelled()
+        
+        # Nach einem Neustart: Download war schon fertig, nur die Konvertierung fehlt noch
+        source_path = checkpoint.get('source_path')
+        if source_path and os.path.exists(source_path):
+            logger.info(f"Resuming job {download_id} at conversion of {source_path}")
+            job_store.put(download_id, {
+                'status': 'converting',
+                'phase': 'convert',
+                'progress': 50,
+                'message': 'Warte auf Konvertierung...'
+            })
+            return [(checkpoint.get('info') or {}, source_path)]
+        
         # Check if output directory is writable
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
         
         output_template = f'{output_folder}/%(title)s.%(ext)s'
         
-        # Build yt-dlp options
+        # Build yt-dlp options - FFmpeg läuft separat im Transcode-Pool
         ydl_opts = {
             'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': quality,
-            }],
             'outtmpl': output_template,
             'nocheckcertificate': True,
             'quiet': False,
             'no_warnings': False,
+            'socket_timeout': SOCKET_TIMEOUT,
         }
+        if COOKIE_FILE:
+            ydl_opts['cookiefile'] = COOKIE_FILE
+        if checkpoint.get('format_id'):
+            # Dasselbe Format wie vor dem Neustart, damit yt-dlp die .part-Datei per Range-Request fortsetzt
+            ydl_opts['format'] = f"{checkpoint['format_id']}/{ydl_opts['format']}"
+            logger.info(f"Resuming job {download_id} with format {checkpoint['format_id']} "
+                        f"from {checkpoint.get('downloaded_bytes', 0)} bytes")
         
-        download_status[download_id] = {
+        job_store.put(download_id, {
             'status': 'downloading',
             'progress': 0,
             'message': 'Starte Download...'
-        }
+        })
+        
+        def on_progress(p):
+            # Der Download macht die erste Hälfte des Fortschritts aus, die Konvertierung die zweite
+            fields = {key: p[key] for key in ('phase', 'downloaded_bytes', 'total_bytes', 'speed', 'eta')}
+            if p['percent'] is not None:
+                fields['progress'] = int(p['percent'] / 2)
+                fields['message'] = f"Download... {p['percent']:.1f}%"
+            job_store.update(download_id, **fields)
+            if p['format_id']:
+                job_store.checkpoint(download_id, format_id=p['format_id'], part_file=p['tmpfilename'],
+                                     downloaded_bytes=p['downloaded_bytes'])
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+        # Der Abbruch-Hook läuft bei jedem geladenen Block und bricht den Download ab
+        ydl_opts['progress_hooks'] = [cancel_token.progress_hook, ProgressHook(on_progress, PROGRESS_INTERVAL)]
+        
+        with shared_pool.checkout(ydl_opts) as ydl:
+            if sync:
+                sync_library(ydl, video_url, ydl_opts, output_folder, artist, album, quality, download_id)
+                release_cancel_token(download_id)
+                return None
+            
+            info, entries = resolve_playlist(ydl, video_url)
+            cancel_token.raise_if_cancelled()
             
-            if '_type' in info and info['_type'] == 'playlist':
-                for entry in info['entries']:
-                    filename = ydl.prepare_filename(entry).replace(".webm", ".mp3").replace(".m4a", ".mp3").replace(".mp4", ".mp3")
-                    audio = EasyID3(filename)
-                    audio["artist"] = artist or "Unknown"
-                    audio["album"] = album or "Unknown"
-                    audio["title"] = entry.get("title", "Unknown Title")
-                    audio.save()
-                    save_thumbnail(entry, filename, output_folder)
-            else:
-                filename = ydl.prepare_filename(info).replace(".webm", ".mp3").replace(".m4a", ".mp3").replace(".mp4", ".mp3")
-                audio = EasyID3(filename)
-                audio["artist"] = artist or "Unknown"
-                audio["album"] = album or "Unknown"
-                audio["title"] = info.get("title", "Unknown Title")
-                audio.save()
-                save_thumbnail(info, filename, output_folder)
-        
-        download_status[download_id] = {
+            if entries is not None:
+                download_playlist(entries, ydl_opts, output_folder, artist, album, quality,
+                                  download_id, info.get('playlist_count'))
+                release_cancel_token(download_id)
+                return None
+            
+            downloads = [job_engine(quality).download(ydl, info)]
+            job_store.checkpoint(download_id, source_path=downloads[0][1], info={
+                key: info.get(key) for key in ('id', 'title', 'thumbnail')})
+        
+        job_store.put(download_id, {
+            'status': 'converting',
+            'phase': 'convert',
+            'progress': 50,
+            'message': 'Warte auf Konvertierung...'
+        })
+        return downloads
+        
+    except Exception as e:
+        if cancel_token.cancelled:
+            finish_cancelled(download_id, cancel_token)
+            return None
+        release_cancel_token(download_id)
+        logger.error(f"Download error: {e}")
+        job_store.put(download_id, {
+            'status': 'error',
+            'progress': 0,
+            'message': f'Fehler: {str(e)}',
+            'error': str(e)
+        })
+        return None
+
+
+def sync_library(ydl, video_url, ydl_opts, output_folder, artist, album, quality, download_id):
+    """
+    Sync mode: list the playlist or channel flat, diff it against the archive and
+    the files in output_folder by video ID and only download the new entries.
+    """
+    job_store.update(download_id, phase='sync', message='Vergleiche mit Bibliothek...')
+    _, new_entries, total = plan_sync(ydl, video_url, output_folder, quality, download_archive)
+    cancel_token_for(download_id).raise_if_cancelled()
+    summary = {'total': total, 'new': len(new_entries), 'skipped': total - len(new_entries)}
+    if not new_entries:
+        job_store.put(download_id, {
+            'status': 'completed',
+            'progress': 100,
+            'message': f'Bibliothek aktuell, {total} Titel vorhanden',
+            'sync': summary
+        })
+        logger.info(f"Sync of {video_url}: nothing new")
+        return
+    job_store.update(download_id, sync=summary, message=f'{len(new_entries)} neue Titel')
+    download_playlist(new_entries, ydl_opts, output_folder, artist, album, quality, download_id,
+                      len(new_entries), sync=summary)
+
+
+def download_playlist(entries, ydl_opts, output_folder, artist, album, quality, download_id, total=None,
+                      sync=None):
+    """
+    Stream playlist entries through download -> transcode -> cover art -> tag,
+    or download -> cover art -> transcode with tags if TAG_MODE is 'ffmpeg'.
+
+    Up to PLAYLIST_CONCURRENCY entries are in flight at once; the state of
+    every entry is reported in the 'entries' list of the job status. In
+    fan-out mode the entry list is flat-extracted first and downloads are
+    only bounded by DOWNLOAD_SLOTS and HOST_LIMITER, while finished downloads
+    wait for the transcode pool.
+
+    :param sync: Summary of a sync run, kept in the final job status.
+    """
+    cancel_token = cancel_token_for(download_id)
+    entry_states = {}
+    lock = threading.Lock()
+    # Titel, die vor einem Neustart schon fertig waren, werden übersprungen
+    completed_entries = set(job_store.get_checkpoint(download_id).get('completed_entries', []))
+
+    def on_finished(item):
+        add_to_cache(item['info'], item['filename'], artist, album, quality)
+        with lock:
+            completed_entries.add(item['info'].get('id'))
+            job_store.checkpoint(download_id, completed_entries=sorted(filter(None, completed_entries)))
+
+    def on_entry_status(state, total):
+        with lock:
+            entry_states[state['index']] = state
+            done = sum(1 for s in entry_states.values() if s['status'] in ('completed', 'error'))
+            count = max(total or 0, len(entry_states))
+            job_store.update(
+                download_id,
+                progress=min(99, int(done * 100 / count)),
+                message=f'{done}/{count} Titel verarbeitet',
+                entries=[entry_states[i] for i in sorted(entry_states)]
+            )
+
+    def skip(item):
+        if item['entry'].get('id') in completed_entries:
+            return True
+        item['filename'] = restore_from_cache(item['entry'].get('id'), output_folder, artist, album, quality)
+        return item['filename'] is not None
+
+    states = job_engine(quality).run_playlist(
+        entries, ydl_opts, output_folder, artist, album, cancel_token, total,
+        skip=skip, on_finished=on_finished, on_entry_status=on_entry_status
+    )
+    
+    completed = [state for state in states if state['status'] == 'completed']
+    failed = [state for state in states if state['status'] == 'error']
+    
+    record = {
+        'status': 'completed',
+        'progress': 100,
+        'message': f'Download abgeschlossen! {len(completed)} Titel, {len(failed)} fehlgeschlagen',
+        'entries': states
+    }
+    if sync:
+        record['sync'] = sync
+    job_store.put(download_id, record)
+    logger.info(f"Playlist completed: {len(completed)} entries, {len(failed)} failed")
+
+
+def convert_downloaded_audio(downloads, output_folder, artist, album, quality, download_id):
+    """Transcode stage: convert downloaded files to MP3 and write tags and cover"""
+    cancel_token = cancel_token_for(download_id)
+    try:
+        job_store.update(download_id, message='Konvertiere zu MP3...')
+        filename = None
+        engine = job_engine(quality)
+        for entry, source_path in downloads:
+            cancel_token.track(source_path)
+            filename = engine.convert(entry, source_path, artist, album, cancel_event=cancel_token)
+            add_to_cache(entry, filename, artist, album, quality)
+        
+        job_store.put(download_id, {
             'status': 'completed',
             'progress': 100,
             'message': 'Download abgeschlossen!',
             'filename': filename
-        }
+        })
         logger.info(f"Download completed: {filename}")
         
     except Exception as e:
-        logger.error(f"Download error: {e}")
-        download_status[download_id] = {
+        if cancel_token.cancelled or isinstance(e, TranscodeCancelled):
+            finish_cancelled(download_id, cancel_token)
+            return
+        logger.error(f"Conversion error: {e}")
+        job_store.put(download_id, {
             'status': 'error',
             'progress': 0,
             'message': f'Fehler: {str(e)}',
             'error': str(e)
-        }
+        })
+    finally:
+        release_cancel_token(download_id)
+
+
+def enqueue_job(download_id, job_request, create=True):
+    """
+    Put a job into the scheduler queue.
+
+    :param job_request: Request parameters (url, quality, artist, album, downloadFolder,
+        optional mode 'sync').
+    :param create: Create the job record; False when re-queueing a recovered job.
+    :return: Position of the job in the queue.
+    :raises QueueFullError: If the queue is full.
+    """
+    queued = {
+        'status': 'queued',
+        'progress': 0,
+        'message': 'In Warteschlange...'
+    }
+    if create:
+        job_store.create(download_id, queued, job_request)
+    else:
+        job_store.put(download_id, queued)
+    with cancel_tokens_lock:
+        cancel_tokens[download_id] = CancelToken()
+    
+    video_url = job_request['url']
+    quality = job_request['quality']
+    download_folder = job_request['downloadFolder']
+    try:
+        return scheduler.submit(
+            download_id,
+            lambda: download_audio_async(
+                video_url, download_folder, job_request['artist'], job_request['album'], quality, download_id,
+                sync=job_request.get('mode') == 'sync'),
+            lambda downloads: convert_downloaded_audio(
+                downloads, download_folder, job_request['artist'], job_request['album'], quality, download_id)
+        )
+    except QueueFullError:
+        release_cancel_token(download_id)
+        if create:
+            job_store.delete(download_id)
+        raise
+
+
+def recover_unfinished_jobs():
+    """
+    Handle jobs that were still running when the server stopped.
+
+    By default they are queued again and continue from their checkpoint: the
+    same format is requested so yt-dlp resumes the .part file with a range
+    request, finished playlist entries are skipped and a finished download goes
+    straight to conversion. With CONVERT2MP3_RESUME_JOBS=0 they are marked as failed.
+    """
+    resume = os.environ.get('CONVERT2MP3_RESUME_JOBS', '1') == '1'
+    for download_id, record, job_request in job_store.unfinished():
+        if resume and job_request:
+            try:
+                enqueue_job(download_id, job_request, create=False)
+                logger.info(f"Resumed job {download_id} after restart")
+                continue
+            except QueueFullError:
+                pass
+        job_store.put(download_id, {
+            'status': 'error',
+            'progress': 0,
+            'message': 'Fehler: Server wurde neu gestartet',
+            'error': 'Server restarted while the job was running'
+        })
+        logger.info(f"Marked job {download_id} as failed after restart")
+
+
+def resolve_download_folder(download_folder):
+    """Relative download folders are placed in the project directory"""
+    if not os.path.isabs(download_folder):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        download_folder = os.path.join(base_dir, download_folder)
+    return download_folder
 
 
 @app.route('/health', methods=['GET'])
@@ -172,27 +531,50 @@ def convert():
         if not video_url:
             return jsonify({'success': False, 'error': 'Keine URL angegeben'}), 400
         
-        # Resolve download folder path
-        if not os.path.isabs(download_folder):
-            # Relative path - use project directory
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            download_folder = os.path.join(base_dir, download_folder)
+        download_folder = resolve_download_folder(download_folder)
         
         # Generate download ID
         import uuid
         download_id = str(uuid.uuid4())
         
-        # Start download in background thread
-        thread = threading.Thread(
-            target=download_audio_async,
-            args=(video_url, download_folder, artist, album, quality, download_id)
-        )
-        thread.daemon = True
-        thread.start()
+        # Bereits konvertiert? Dann sofort aus dem Cache bereitstellen
+        video_id = video_id_from_url(video_url) if 'list=' not in video_url else None
+        if video_id and output_cache is not None:
+            os.makedirs(download_folder, exist_ok=True)
+            filename = restore_from_cache(video_id, download_folder, artist, album, quality)
+            if filename:
+                job_store.create(download_id, {
+                    'status': 'completed',
+                    'progress': 100,
+                    'message': 'Download abgeschlossen! (aus Cache)',
+                    'filename': filename,
+                    'cached': True
+                })
+                return jsonify({
+                    'success': True,
+                    'download_id': download_id,
+                    'cached': True,
+                    'message': 'Download abgeschlossen'
+                })
+        
+        try:
+            position = enqueue_job(download_id, {
+                'url': video_url,
+                'quality': quality,
+                'artist': artist,
+                'album': album,
+                'downloadFolder': download_folder
+            })
+        except QueueFullError as e:
+            logger.warning(f"Queue full, rejecting {video_url}")
+            response = jsonify({'success': False, 'error': 'Server ausgelastet, bitte später erneut versuchen'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
         
         return jsonify({
             'success': True,
             'download_id': download_id,
+            'queue_position': position,
             'message': 'Download gestartet'
         })
         
@@ -201,15 +583,184 @@ def convert():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/sync', methods=['POST'])
+def sync():
+    """
+    Download only the entries of a playlist or channel that are not yet in the
+    download folder. With dryRun the new entries are listed without downloading.
+    """
+    try:
+        data = request.json
+        
+        video_url = data.get('url')
+        quality = data.get('quality', '192')
+        download_folder = resolve_download_folder(data.get('downloadFolder', 'downloads'))
+        
+        if not video_url:
+            return jsonify({'success': False, 'error': 'Keine URL angegeben'}), 400
+        
+        if data.get('dryRun'):
+            probe_opts = {'quiet': True, 'socket_timeout': SOCKET_TIMEOUT}
+            if COOKIE_FILE:
+                probe_opts['cookiefile'] = COOKIE_FILE
+            with shared_pool.checkout(probe_opts) as ydl:
+                _, new_entries, total = plan_sync(ydl, video_url, download_folder, quality, download_archive)
+            return jsonify({
+                'success': True,
+                'total': total,
+                'new': len(new_entries),
+                'skipped': total - len(new_entries),
+                'entries': [{'id': entry.get('id'), 'title': entry.get('title'), 'url': entry_url(entry)}
+                            for entry in new_entries]
+            })
+        
+        import uuid
+        download_id = str(uuid.uuid4())
+        try:
+            position = enqueue_job(download_id, {
+                'url': video_url,
+                'quality': quality,
+                'artist': data.get('artist', ''),
+                'album': data.get('album', ''),
+                'downloadFolder': download_folder,
+                'mode': 'sync'
+            })
+        except QueueFullError as e:
+            logger.warning(f"Queue full, rejecting sync of {video_url}")
+            response = jsonify({'success': False, 'error': 'Server ausgelastet, bitte später erneut versuchen'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
+        
+        return jsonify({
+            'success': True,
+            'download_id': download_id,
+            'queue_position': position,
+            'message': 'Abgleich gestartet'
+        })
+        
+    except Exception as e:
+        logger.error(f"Sync error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Output cache hit/miss counters"""
+    if output_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **output_cache.stats()})
+
+
+@app.route('/http-pool', methods=['GET'])
+def http_pool_stats():
+    """Request and connection reuse counters of the pooled HTTP session"""
+    return jsonify(http_pool.stats())
+
+
+@app.route('/ydl-pool', methods=['GET'])
+def ydl_pool_stats():
+    """Created and reused YoutubeDL instances and their setup time"""
+    return jsonify(shared_pool.stats())
+
+
 @app.route('/status/<download_id>', methods=['GET'])
 def get_status(download_id):
     """Get download status"""
-    if download_id in download_status:
-        return jsonify(download_status[download_id])
+    status = job_store.get(download_id)
+    if status is not None:
+        if status['status'] == 'queued':
+            status['queue_position'] = scheduler.position(download_id)
+        return jsonify(status)
     else:
         return jsonify({'status': 'not_found'}), 404
 
 
+@app.route('/jobs/<download_id>', methods=['DELETE'])
+def cancel_job(download_id):
+    """
+    Cancel a job.
+
+    A waiting job is removed from the queue at once. A running job stops at its
+    next downloaded block or within a fraction of a second if FFmpeg is running,
+    removes its partial files and then reports 'cancelled'.
+    """
+    record = job_store.get(download_id)
+    if record is None:
+        return jsonify({'success': False, 'error': 'Job nicht gefunden'}), 404
+    if record['status'] in FINISHED_STATES:
+        return jsonify({'success': False, 'status': record['status'], 'error': 'Job ist bereits beendet'}), 409
+    
+    if scheduler.cancel(download_id):
+        finish_cancelled(download_id, cancel_token_for(download_id))
+        return jsonify({'success': True, 'status': 'cancelled'})
+    
+    with cancel_tokens_lock:
+        cancel_token = cancel_tokens.get(download_id)
+    if cancel_token is None:
+        # Kein laufender Worker mehr (z.B. nach einem Neustart)
+        finish_cancelled(download_id, CancelToken())
+        return jsonify({'success': True, 'status': 'cancelled'})
+    # Der Worker setzt den Status auf 'cancelled', sobald er aufgeräumt hat
+    cancel_token.cancel()
+    return jsonify({'success': True, 'status': 'cancelling'}), 202
+
+
+def stream_events(job_ids):
+    """
+    Yield SSE messages for the given jobs until all of them have finished.
+
+    Each message carries the full status record plus 'download_id'. The
+    current state is sent first, so a client that connects late misses nothing.
+    """
+    subscription = events.subscribe(job_ids)
+    try:
+        pending = set()
+        for download_id in job_ids:
+            record = job_store.get(download_id)
+            if record is None:
+                yield sse_message({'download_id': download_id, 'status': 'not_found'}, 'status')
+                continue
+            if record['status'] == 'queued':
+                record['queue_position'] = scheduler.position(download_id)
+            yield sse_message(dict(record, download_id=download_id), 'status')
+            if record['status'] not in FINISHED_STATES:
+                pending.add(download_id)
+        
+        while pending:
+            event = subscription.get(timeout=SSE_KEEPALIVE)
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            download_id, record = event
+            yield sse_message(dict(record, download_id=download_id), 'status')
+            if record.get('status') in FINISHED_STATES:
+                pending.discard(download_id)
+    finally:
+        events.unsubscribe(subscription)
+
+
+def sse_response(job_ids):
+    return Response(stream_events(job_ids), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/events/<download_id>', methods=['GET'])
+def job_events(download_id):
+    """Push status updates of one job as Server-Sent Events"""
+    return sse_response([download_id])
+
+
+@app.route('/events', methods=['GET'])
+def multi_job_events():
+    """Push status updates of several jobs (?ids=a,b,c) over one SSE connection"""
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    if not job_ids:
+        return jsonify({'success': False, 'error': 'Keine Download-IDs angegeben'}), 400
+    return sse_response(list(dict.fromkeys(job_ids)))
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("Convert2MP3 Backend Server")
@@ -218,5 +769,7 @@ if __name__ == '__main__':
     print("Stelle sicher, dass die Chrome Extension diese URL verwendet.")
     print("=" * 50)
     
-    app.run(host='localhost', port=8765, debug=False)
+    preload_in_background()
+    recover_unfinished_jobs()
+    app.run(host='localhost', port=8765, debug=False, threaded=True)
 
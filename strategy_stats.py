@@ -0,0 +1,174 @@
+"""
+Adaptive ranking of download strategies.
+
+Every attempt records success or failure, latency and the class of the error
+per strategy (format selector + player client). Strategies are then ordered by
+their recent success rate (older results decay with a half-life), and
+strategies that failed for a video with an error that will not go away on a
+retry (e.g. "requested format is not available") are skipped for that video.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser("~"), ".convert2mp3", "strategy_stats.json")
+
+# Errors that will fail the same way again for the same video and strategy
+DETERMINISTIC_ERRORS = ('format_unavailable', 'no_formats')
+
+MAX_VIDEOS = 500
+
+
+def classify_error(error):
+    """Map an exception from yt-dlp/FFmpeg to a short error class"""
+    message = str(error).lower()
+    if "requested format is not available" in message:
+        return 'format_unavailable'
+    if "no formats found" in message or "only images are available" in message:
+        return 'no_formats'
+    if "sign in to confirm" in message or "authentication" in message or "confirm you're not a bot" in message:
+        return 'auth'
+    if "private video" in message or "video unavailable" in message:
+        return 'unavailable'
+    if "audio conversion failed" in message or "ffmpeg" in message or "ffprobe" in message:
+        return 'ffmpeg'
+    if "permission" in message or "unable to create directory" in message:
+        return 'permission'
+    if "http error 403" in message or "http error 429" in message:
+        return 'throttled'
+    if "timed out" in message or "connection" in message or "network" in message:
+        return 'network'
+    return 'other'
+
+
+def video_id_from_url(url):
+    """Return the YouTube video ID of a URL, or None"""
+    match = re.search(r'(?:v=|youtu\.be/|/shorts/)([\w-]{11})', url or "")
+    return match.group(1) if match else None
+
+
+def strategy_key(ydl_opts):
+    """
+    Return (key, client) identifying a strategy built in MyGUI.download_audio.
+
+    The key is format|client, followed by the other extractor arguments (e.g.
+    skip=hls) since strategies that differ only in those fail differently.
+    """
+    extractor_args = ydl_opts.get('extractor_args', {})
+    client = extractor_args.get('youtube', {}).get('player_client', ['default'])[0]
+    key = f"{ydl_opts.get('format', '')}|{client}"
+    for ie_key, args in sorted(extractor_args.items()):
+        for name, values in sorted(args.items()):
+            if (ie_key, name) == ('youtube', 'player_client'):
+                continue
+            prefix = '' if ie_key == 'youtube' else f"{ie_key}:"
+            key += f"|{prefix}{name}={','.join(sorted(map(str, values)))}"
+    return key, client
+
+
+class StrategyStats:
+    """
+    Success statistics per strategy, persisted as JSON.
+
+    :param path: JSON file holding the statistics.
+    :param half_life: Seconds after which old results count half.
+    """
+
+    def __init__(self, path=DEFAULT_STATS_PATH, half_life=7 * 24 * 3600):
+        self.path = path
+        self.half_life = half_life
+        self._lock = threading.Lock()
+        self._data = {'strategies': {}, 'videos': {}}
+        self._load()
+
+    def rank(self, strategies, video_id=None):
+        """
+        Order strategies by decayed success rate.
+
+        Strategies with a known deterministic failure for video_id are dropped,
+        but at least one strategy is always returned. Equal scores keep the
+        original order.
+        """
+        with self._lock:
+            failed = self._data['videos'].get(video_id, {}) if video_id else {}
+            scored = []
+            for position, opts in enumerate(strategies):
+                key, _ = strategy_key(opts)
+                if key in failed and failed[key][0] in DETERMINISTIC_ERRORS:
+                    continue
+                scored.append((-self._score_locked(key), position, opts))
+        if not scored:
+            return list(strategies[:1])
+        skipped = len(strategies) - len(scored)
+        if skipped:
+            logger.info(f"Skipping {skipped} strategies that are known to fail for video {video_id}")
+        return [opts for _, _, opts in sorted(scored, key=lambda item: item[:2])]
+
+    def record(self, ydl_opts, success, latency, error=None, video_id=None):
+        """Record the outcome of one strategy attempt and save the statistics"""
+        key, client = strategy_key(ydl_opts)
+        error_class = classify_error(error) if error is not None else None
+        now = time.time()
+        with self._lock:
+            stats = self._data['strategies'].setdefault(key, {
+                'client': client, 'success': 0.0, 'failure': 0.0,
+                'latency': latency, 'errors': {}, 'updated': now
+            })
+            decay = self._decay(now - stats['updated'])
+            stats['success'] *= decay
+            stats['failure'] *= decay
+            if success:
+                stats['success'] += 1
+                stats['latency'] = 0.7 * stats['latency'] + 0.3 * latency
+            else:
+                stats['failure'] += 1
+                stats['errors'][error_class] = stats['errors'].get(error_class, 0) + 1
+            stats['updated'] = now
+
+            if video_id and error_class in DETERMINISTIC_ERRORS:
+                videos = self._data['videos']
+                videos.setdefault(video_id, {})[key] = [error_class, now]
+                if len(videos) > MAX_VIDEOS:
+                    oldest = min(videos, key=lambda vid: max(entry[1] for entry in videos[vid].values()))
+                    del videos[oldest]
+            self._save_locked()
+        return error_class
+
+    def _score_locked(self, key):
+        stats = self._data['strategies'].get(key)
+        if not stats:
+            return 0.5
+        decay = self._decay(time.time() - stats['updated'])
+        success = stats['success'] * decay
+        failure = stats['failure'] * decay
+        # Laplace smoothing so unknown strategies start in the middle
+        return (success + 1) / (success + failure + 2)
+
+    def _decay(self, age):
+        return 0.5 ** (max(age, 0) / self.half_life)
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._data['strategies'] = data.get('strategies', {})
+            self._data['videos'] = data.get('videos', {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not read strategy stats {self.path}: {e}")
+
+    def _save_locked(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self._data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save strategy stats {self.path}: {e}")
@@ -0,0 +1,83 @@
+"""
+Single-pass ID3 tagging.
+
+Text frames and the cover are collected into one ID3 tag and written with a
+single save. Extra padding is reserved so later tag edits fit into the
+existing header instead of rewriting the whole audio payload. Files kept in
+their original codec (M4A, Opus, Ogg Vorbis, FLAC) get the same fields in
+their container's own tag format.
+"""
+import base64
+import os
+
+from lazy_imports import lazy_import
+
+mutagen = lazy_import('mutagen')
+mp3 = lazy_import('mutagen.mp3')
+mp4 = lazy_import('mutagen.mp4')
+flac = lazy_import('mutagen.flac')
+id3 = lazy_import('mutagen.id3')
+
+# Space reserved in the ID3 header for later edits
+TAG_PADDING = 64 * 1024
+# Below this much free space the tag is grown back to TAG_PADDING
+MIN_PADDING = 1024
+
+
+def _padding(info):
+    # Keep the existing layout as long as the new tag fits, so the audio isn't moved
+    return info.padding if info.padding >= MIN_PADDING else TAG_PADDING
+
+
+def write_tags(filename, artist, album, title, cover=None):
+    """
+    Write artist, album, title and optionally the cover in one save.
+
+    :param cover: JPEG data for the front cover; an existing cover is kept if None.
+    """
+    if os.path.splitext(filename)[1].lower() != ".mp3":
+        _write_container_tags(filename, artist, album, title, cover)
+        return
+    audio_file = mp3.MP3(filename, ID3=id3.ID3)
+    if audio_file.tags is None:
+        audio_file.add_tags()
+    tags = audio_file.tags
+    tags.setall("TPE1", [id3.TPE1(encoding=3, text=[artist])])
+    tags.setall("TALB", [id3.TALB(encoding=3, text=[album])])
+    tags.setall("TIT2", [id3.TIT2(encoding=3, text=[title])])
+    if cover:
+        tags.setall("APIC", [id3.APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=cover)])
+    audio_file.save(v2_version=3, padding=_padding)
+
+
+def _write_container_tags(filename, artist, album, title, cover=None):
+    """MP4 atoms or Vorbis comments for files in their original codec"""
+    audio_file = mutagen.File(filename)
+    if audio_file is None:
+        raise ValueError(f"Unsupported audio file: {filename}")
+    if audio_file.tags is None:
+        audio_file.add_tags()
+    tags = audio_file.tags
+    if isinstance(audio_file, mp4.MP4):
+        tags["\xa9ART"] = [artist]
+        tags["\xa9alb"] = [album]
+        tags["\xa9nam"] = [title]
+        if cover:
+            tags["covr"] = [mp4.MP4Cover(cover, imageformat=mp4.MP4Cover.FORMAT_JPEG)]
+    else:
+        tags["artist"] = [artist]
+        tags["album"] = [album]
+        tags["title"] = [title]
+        if cover:
+            picture = flac.Picture()
+            picture.type = 3
+            picture.mime = "image/jpeg"
+            picture.desc = "Cover"
+            picture.data = cover
+            if isinstance(audio_file, flac.FLAC):
+                audio_file.clear_pictures()
+                audio_file.add_picture(picture)
+            else:
+                # Ogg has no picture block, the FLAC picture goes base64-encoded into a comment
+                tags["metadata_block_picture"] = [base64.b64encode(picture.write()).decode("ascii")]
+    audio_file.save()
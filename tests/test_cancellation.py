@@ -0,0 +1,45 @@
+import os
+
+import pytest
+from yt_dlp.utils import DownloadCancelled
+
+from cancellation import CancelToken
+
+
+def touch(path):
+    open(path, 'w').close()
+    return str(path)
+
+
+def test_progress_hook_raises_once_cancelled(tmp_path):
+    token = CancelToken()
+    token.progress_hook({'status': 'downloading', 'filename': str(tmp_path / 'a.webm')})
+    token.cancel()
+    assert token.cancelled and token.is_set()
+    with pytest.raises(DownloadCancelled):
+        token.progress_hook({'status': 'downloading'})
+
+
+def test_cleanup_removes_partial_and_fragment_files(tmp_path):
+    token = CancelToken()
+    target = str(tmp_path / 'song.webm')
+    partial = [touch(target + suffix) for suffix in ('.part', '.ytdl')]
+    fragments = [touch(f"{target}.part-Frag{i}") for i in (1, 2)]
+    unrelated = touch(tmp_path / 'other.webm.part')
+    token.progress_hook({'status': 'downloading', 'filename': target, 'tmpfilename': target + '.part'})
+
+    token.cleanup()
+    assert not any(os.path.exists(path) for path in partial + fragments)
+    assert os.path.exists(unrelated)
+
+
+def test_finished_and_untracked_files_are_kept(tmp_path):
+    token = CancelToken()
+    source = touch(tmp_path / 'song.webm')
+    output = touch(tmp_path / 'song.mp3')
+    token.progress_hook({'status': 'finished', 'filename': source, 'tmpfilename': source + '.part'})
+    token.track(output)
+    token.untrack(output)
+
+    token.cleanup()
+    assert os.path.exists(source) and os.path.exists(output)
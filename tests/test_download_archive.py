@@ -0,0 +1,46 @@
+import os
+
+from download_archive import DownloadArchive
+
+
+def write(path, data=b'mp3 data'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_lookup_by_video_and_quality(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'archive.db'))
+    song = write(tmp_path / 'song.mp3')
+    archive.add('abcdefghijk', 192, song)
+
+    entry = archive.lookup('abcdefghijk', '192')
+    assert entry['path'] == os.path.abspath(song)
+    assert archive.lookup('abcdefghijk', '320') is None
+    assert archive.lookup('bcdefghijkl', '192') is None
+    assert archive.lookup(None, '192') is None
+    assert archive.verify('abcdefghijk', '192')
+
+
+def test_lookup_checks_folder_and_file(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'archive.db'))
+    song = write(tmp_path / 'song.mp3')
+    archive.add('abcdefghijk', '192', song)
+
+    assert archive.lookup('abcdefghijk', '192', output_folder=str(tmp_path)) is not None
+    assert archive.lookup('abcdefghijk', '192', output_folder=str(tmp_path / 'other')) is None
+    assert archive.ids_in(str(tmp_path), '192') == {'abcdefghijk'}
+
+    write(song, b'retagged')
+    assert not archive.verify('abcdefghijk', '192')
+    os.remove(song)
+    assert archive.lookup('abcdefghijk', '192') is None
+    assert archive.ids_in(str(tmp_path), '192') == set()
+
+
+def test_index_is_loaded_from_disk(tmp_path):
+    song = write(tmp_path / 'song.mp3')
+    DownloadArchive(str(tmp_path / 'archive.db')).add('abcdefghijk', '192', song)
+    reopened = DownloadArchive(str(tmp_path / 'archive.db'))
+    assert len(reopened) == 1
+    assert reopened.lookup('abcdefghijk', '192')['path'] == os.path.abspath(song)
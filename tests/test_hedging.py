@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+import hedging
+from info_cache import InfoCache, extraction_profile
+from ydl_pool import YoutubeDLPool
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def strategy(client, format_spec='bestaudio', skip_hls=False):
+    youtube = {'player_client': [client]}
+    if skip_hls:
+        youtube['skip'] = ['hls']
+    return {'format': format_spec, 'outtmpl': '/tmp/x', 'progress_hooks': [lambda d: None],
+            'extractor_args': {'youtube': youtube}}
+
+
+def info(video_id="dQw4w9WgXcQ"):
+    return {'id': video_id, 'formats': [{'acodec': 'opus', 'url': 'https://host/a'}]}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = YoutubeDLPool()
+    monkeypatch.setattr(hedging, 'shared_pool', pool)
+    monkeypatch.setattr(hedging, 'shared_cache', InfoCache())
+    yield pool
+    pool.close()
+
+
+def test_distinct_extractions_keeps_best_ranked_per_profile():
+    strategies = [strategy('android', 'f1', True), strategy('android', 'f2', True), strategy('web', 'f1', True),
+                  strategy('android', 'b'), strategy('ios', 'b')]
+    candidates = hedging.distinct_extractions(strategies, 3)
+    assert candidates == [strategies[0], strategies[2], strategies[3]]
+
+
+def test_loser_is_stopped_and_released(pool, monkeypatch):
+    loser_done = threading.Event()
+    outcome = {}
+
+    def fake_extract(ydl, url, client):
+        if client == 'android':
+            return info()
+        # The loser keeps requesting pages until the race is decided
+        try:
+            while True:
+                time.sleep(0.01)
+                ydl.urlopen('https://host/page')
+        except Exception as e:
+            outcome['error'] = e
+            raise
+        finally:
+            loser_done.set()
+
+    monkeypatch.setattr(hedging, 'extract_info_cached', fake_extract)
+    winner = hedging.race_extraction(URL, [strategy('android'), strategy('web')], top_k=2)
+    assert winner[0]['extractor_args']['youtube']['player_client'] == ['android']
+    assert loser_done.wait(2)
+    assert type(outcome['error']).__name__ == 'DownloadCancelled'
+    time.sleep(0.05)
+    assert pool.stats()['idle'] == 2
+    # The pooled instances get their own urlopen back
+    for instances in pool._idle.values():
+        assert all('urlopen' not in ydl.__dict__ for ydl in instances)
+
+
+def test_cached_result_wins_without_instances(pool):
+    opts = strategy('web')
+    hedging.shared_cache.put("dQw4w9WgXcQ", 'web', info(), extraction_profile(opts))
+    assert hedging.race_extraction(URL, [opts], top_k=1) == (opts, info())
+    assert pool.stats()['created'] == 0
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from info_cache import InfoCache, extract_info_cached, extraction_profile
+from ydl_pool import YoutubeDLPool
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+# Options as built by MyGUI._check_formats_worker, MyGUI.download_audio and the server
+CHECK_FORMATS_OPTS = {'quiet': True, 'no_warnings': False, 'extract_flat': False,
+                      'extractor_args': {'youtube': {'player_client': ['web']}}}
+DOWNLOAD_OPTS = {'format': 'bestaudio/best', 'outtmpl': '/tmp/%(title)s.%(ext)s', 'nocheckcertificate': True,
+                 'progress_hooks': [lambda d: None], 'verbose': True, 'socket_timeout': 20,
+                 'extractor_args': {'youtube': {'player_client': ['web']}}}
+SERVER_OPTS = {'format': 'bestaudio/best', 'outtmpl': '/tmp/%(title)s.%(ext)s', 'nocheckcertificate': True,
+               'quiet': False, 'no_warnings': False, 'socket_timeout': 20}
+
+
+def fake_info(video_id="dQw4w9WgXcQ"):
+    return {'id': video_id, 'title': 'Song', 'formats': [
+        {'format_id': '251', 'acodec': 'opus', 'url': f'https://host/a?expire={int(time.time()) + 7200}'}]}
+
+
+@pytest.fixture
+def pool():
+    pool = YoutubeDLPool()
+    yield pool
+    pool.close()
+
+
+def extract(pool, cache, opts, client='web'):
+    calls = []
+    with pool.checkout(opts) as ydl:
+        ydl.extract_info = lambda url, **kwargs: calls.append(url) or fake_info()
+        info = extract_info_cached(ydl, URL, client, cache=cache)
+    return info, len(calls)
+
+
+def test_check_formats_result_is_reused_by_download(pool):
+    cache = InfoCache()
+    _, extractions = extract(pool, cache, CHECK_FORMATS_OPTS)
+    info, again = extract(pool, cache, DOWNLOAD_OPTS)
+    assert (extractions, again) == (1, 0)
+    assert info['id'] == "dQw4w9WgXcQ"
+
+
+def test_server_shares_default_client_results(pool):
+    cache = InfoCache()
+    extract(pool, cache, {'quiet': True}, client='default')
+    assert extract(pool, cache, SERVER_OPTS, client='default')[1] == 0
+
+
+def test_skipped_hls_is_a_different_profile(pool):
+    cache = InfoCache()
+    extract(pool, cache, DOWNLOAD_OPTS)
+    skip_hls = dict(DOWNLOAD_OPTS, extractor_args={'youtube': {'skip': ['hls'], 'player_client': ['web']}})
+    assert extract(pool, cache, skip_hls)[1] == 1
+
+
+def test_cookies_are_a_different_profile(pool, tmp_path):
+    cookie_file = tmp_path / "cookies.txt"
+    cookie_file.write_text("# Netscape HTTP Cookie File\n")
+    cache = InfoCache()
+    extract(pool, cache, DOWNLOAD_OPTS)
+    assert extract(pool, cache, dict(DOWNLOAD_OPTS, cookiefile=str(cookie_file)))[1] == 1
+    assert extract(pool, cache, dict(CHECK_FORMATS_OPTS, cookiefile=str(cookie_file)))[1] == 0
+
+
+def test_profile_of_options_matches_profile_of_pooled_instance(pool, tmp_path):
+    cookie_file = tmp_path / "cookies.txt"
+    cookie_file.write_text("# Netscape HTTP Cookie File\n")
+    opts = dict(DOWNLOAD_OPTS, cookiefile=str(cookie_file), http_headers={'Referer': 'https://example.com'})
+    with pool.checkout(opts) as ydl:
+        assert extraction_profile(ydl.params, ydl.__dict__.get('cookiejar')) == extraction_profile(opts)
+
+
+def test_playlist_urls_are_not_cached(pool):
+    cache = InfoCache()
+    with pool.checkout(DOWNLOAD_OPTS) as ydl:
+        ydl.extract_info = lambda url, **kwargs: fake_info()
+        extract_info_cached(ydl, URL + "&list=PL123", 'web', cache=cache)
+    assert cache.get("dQw4w9WgXcQ", 'web', extraction_profile(DOWNLOAD_OPTS)) is None
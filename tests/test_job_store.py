@@ -0,0 +1,80 @@
+import pytest
+
+import job_store
+from job_store import JobStore, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(job_store.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return MemoryJobStore(**kwargs)
+        return SQLiteJobStore(str(tmp_path / 'jobs.db'), prune_interval=1, **kwargs)
+    return make
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+
+def test_finished_jobs_expire_after_ttl(make_store, clock):
+    store = make_store(ttl=60)
+    store.create('done', {'status': 'completed'})
+    store.create('running', {'status': 'downloading'})
+    clock[0] += 30
+    assert store.get('done') == {'status': 'completed'}
+    clock[0] += 31
+    assert store.get('done') is None
+    assert store.get('running') == {'status': 'downloading'}
+    assert [job_id for job_id, _, _ in store.unfinished()] == ['running']
+
+
+def test_least_recently_used_finished_job_is_evicted(make_store, clock):
+    store = make_store(max_finished=2)
+    for job_id in ('a', 'b'):
+        store.create(job_id, {'status': 'completed'})
+        clock[0] += 1
+    # Reading a makes b the least recently used one
+    assert 'a' in store
+    clock[0] += 1
+    store.create('c', {'status': 'completed'})
+    store.create('running', {'status': 'downloading'})
+    assert 'b' not in store
+    assert 'a' in store and 'c' in store and 'running' in store
+
+
+def test_checkpoint_round_trip(make_store):
+    store = make_store()
+    store.create('job', {'status': 'downloading'}, {'url': 'https://youtu.be/abcdefghijk'})
+    store.checkpoint('job', format_id='251', downloaded_bytes=1024)
+    store.checkpoint('job', downloaded_bytes=4096, completed_entries=['x'])
+    store.update('job', progress=40)
+    assert store.get_checkpoint('job') == {'format_id': '251', 'downloaded_bytes': 4096, 'completed_entries': ['x']}
+    assert store.unfinished() == [('job', {'status': 'downloading', 'progress': 40},
+                                   {'url': 'https://youtu.be/abcdefghijk'})]
+    # Checkpoints of unknown jobs are ignored, a new job starts without one
+    store.checkpoint('unknown', format_id='140')
+    assert store.get_checkpoint('unknown') == {}
+    store.create('job', {'status': 'queued'})
+    assert store.get_checkpoint('job') == {}
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    store = SQLiteJobStore(path)
+    store.create('job', {'status': 'downloading'}, {'url': 'u'})
+    store.checkpoint('job', part_file='song.webm.part')
+    store.create('done', {'status': 'completed'})
+
+    reopened = SQLiteJobStore(path)
+    assert reopened.get_checkpoint('job') == {'part_file': 'song.webm.part'}
+    assert reopened.unfinished() == [('job', {'status': 'downloading'}, {'url': 'u'})]
+    assert reopened.get('done') == {'status': 'completed'}
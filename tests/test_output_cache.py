@@ -0,0 +1,64 @@
+import os
+from itertools import count
+
+import output_cache
+from output_cache import OutputCache
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_key_depends_on_every_setting():
+    key = OutputCache.key('abcdefghijk', '192', 'mp3', 'libmp3lame-cbr-q5-src')
+    assert key == OutputCache.key('abcdefghijk', '192', 'mp3', 'libmp3lame-cbr-q5-src')
+    assert key != OutputCache.key('abcdefghijk', '320', 'mp3', 'libmp3lame-cbr-q5-src')
+    assert key != OutputCache.key('abcdefghijk', '192', 'opus', 'libmp3lame-cbr-q5-src')
+    assert key != OutputCache.key('abcdefghijk', '192', 'mp3', 'libmp3lame-vbr-q2-44100')
+    assert key != OutputCache.key('bcdefghijkl', '192', 'mp3', 'libmp3lame-cbr-q5-src')
+
+
+def test_lookup_and_materialize(tmp_path):
+    cache = OutputCache(str(tmp_path / 'cache'))
+    key = OutputCache.key('abcdefghijk', '192')
+    assert cache.lookup(key) is None
+
+    cache.store(key, write(tmp_path / 'song.mp3', b'mp3 data'), {'title': 'Song'})
+    assert cache.lookup(key) == {'title': 'Song'}
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    target = str(tmp_path / 'out.mp3')
+    assert cache.materialize(key, target) == target
+    # The placed file is independent of the cached one
+    write(target, b'retagged')
+    assert os.stat(target).st_nlink == 1
+    assert cache.materialize(key, str(tmp_path / 'again.mp3'))
+    assert open(tmp_path / 'again.mp3', 'rb').read() == b'mp3 data'
+
+    # The index survives a restart
+    assert OutputCache(str(tmp_path / 'cache')).lookup(key) == {'title': 'Song'}
+
+
+def test_missing_blob_is_a_miss(tmp_path):
+    cache = OutputCache(str(tmp_path / 'cache'))
+    key = OutputCache.key('abcdefghijk', '192')
+    cache.store(key, write(tmp_path / 'song.mp3', b'mp3 data'), {})
+    os.remove(os.path.join(cache.cache_dir, key + '.mp3'))
+    assert cache.lookup(key) is None
+    assert cache.materialize(key, str(tmp_path / 'out.mp3')) is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    clock = count(1_000_000)
+    monkeypatch.setattr(output_cache.time, 'time', lambda: next(clock))
+    cache = OutputCache(str(tmp_path / 'cache'), max_bytes=20)
+    keys = [OutputCache.key(video_id, '192') for video_id in ('a', 'b', 'c')]
+    cache.store(keys[0], write(tmp_path / 'a.mp3', b'x' * 10), {})
+    cache.store(keys[1], write(tmp_path / 'b.mp3', b'x' * 10), {})
+    assert cache.lookup(keys[0]) is not None
+    cache.store(keys[2], write(tmp_path / 'c.mp3', b'x' * 10), {})
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) is not None and cache.lookup(keys[2]) is not None
+    assert cache.stats()['bytes'] == 20
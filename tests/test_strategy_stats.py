@@ -0,0 +1,54 @@
+import strategy_stats
+from strategy_stats import StrategyStats, classify_error, strategy_key
+
+HALF_LIFE = 3600
+
+
+def make_opts(client, skip=None, fmt='bestaudio/best'):
+    youtube = {'player_client': [client]}
+    if skip:
+        youtube['skip'] = skip
+    return {'format': fmt, 'extractor_args': {'youtube': youtube}}
+
+
+def test_strategy_key_tells_skip_lists_apart():
+    assert strategy_key(make_opts('android')) == ('bestaudio/best|android', 'android')
+    assert strategy_key(make_opts('android', ['hls'])) == ('bestaudio/best|android|skip=hls', 'android')
+    assert strategy_key(make_opts('android', ['hls', 'dash']))[0] == strategy_key(make_opts('android', ['dash', 'hls']))[0]
+    assert strategy_key({'format': 'bestaudio'}) == ('bestaudio|default', 'default')
+
+
+def test_bot_check_is_auth_but_other_bot_mentions_are_not():
+    assert classify_error("Sign in to confirm you're not a bot") == 'auth'
+    assert classify_error("ERROR: Confirm you're not a bot. This helps protect our community") == 'auth'
+    assert classify_error("Video unavailable: uploaded by robotics channel") == 'unavailable'
+    assert classify_error("about botany") == 'other'
+
+
+def test_rank_prefers_recent_successes_and_decays_old_ones(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(strategy_stats.time, 'time', lambda: now[0])
+    stats = StrategyStats(path=str(tmp_path / 'stats.json'), half_life=HALF_LIFE)
+    flaky, steady = make_opts('web'), make_opts('android', ['hls'])
+
+    for _ in range(4):
+        stats.record(flaky, False, 1.0, error=Exception("HTTP Error 403: Forbidden"))
+        stats.record(steady, True, 1.0)
+    assert stats.rank([flaky, steady]) == [steady, flaky]
+
+    # Ten half-lives later the old failures barely count, one fresh success outranks them
+    now[0] += 10 * HALF_LIFE
+    stats.record(flaky, True, 1.0)
+    assert stats.rank([flaky, steady]) == [flaky, steady]
+    assert stats._score_locked(strategy_key(flaky)[0]) > stats._score_locked(strategy_key(steady)[0])
+
+
+def test_rank_skips_deterministic_failures_per_video(tmp_path):
+    stats = StrategyStats(path=str(tmp_path / 'stats.json'))
+    plain, skip_hls = make_opts('android'), make_opts('android', ['hls'])
+    stats.record(skip_hls, False, 1.0, error=Exception("Requested format is not available"), video_id='abcdefghijk')
+
+    assert stats.rank([skip_hls, plain], video_id='abcdefghijk') == [plain]
+    assert stats.rank([skip_hls], video_id='abcdefghijk') == [skip_hls]
+    # Persisted and reloaded
+    assert StrategyStats(path=str(tmp_path / 'stats.json')).rank([skip_hls, plain], video_id='abcdefghijk') == [plain]
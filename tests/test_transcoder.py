@@ -0,0 +1,25 @@
+import pytest
+
+from transcoder import BITRATE_TOLERANCE, plan_transcode
+
+
+@pytest.mark.parametrize('abr, action', [
+    (192, 'copy'),
+    (192 * (1 + BITRATE_TOLERANCE) - 1, 'copy'),
+    (192 * (1 - BITRATE_TOLERANCE) + 1, 'copy'),
+    (192 * (1 + BITRATE_TOLERANCE) + 1, 'encode'),
+    (160, 'encode'),
+    (None, 'encode'),
+])
+def test_mp3_source_is_copied_within_tolerance(abr, action):
+    assert plan_transcode({'acodec': 'mp3', 'abr': abr, 'ext': 'mp3'}, '192') == (action, 'mp3')
+
+
+def test_other_codecs_are_encoded_to_mp3():
+    assert plan_transcode({'acodec': 'opus', 'abr': 192, 'ext': 'webm'}, '192') == ('encode', 'mp3')
+
+
+def test_original_mode_copies_known_codecs():
+    assert plan_transcode({'acodec': 'mp4a.40.2', 'abr': 128, 'ext': 'm4a'}, '192', 'original') == ('copy', 'm4a')
+    assert plan_transcode({'acodec': 'none', 'ext': 'opus'}, '192', 'original') == ('copy', 'opus')
+    assert plan_transcode({'acodec': 'ac3', 'ext': 'mp4'}, '192', 'original') == ('encode', 'mp3')
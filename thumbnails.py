@@ -0,0 +1,49 @@
+"""
+In-memory cover art pipeline.
+
+The thumbnail is fetched into memory over the pooled session of http_pool,
+downscaled (JPEG sources are decoded at reduced size with Image.draft) and
+encoded once.
+The resulting bytes go straight into the ID3 tag, see tagging.write_tags.
+No temporary file is written.
+"""
+import io
+import logging
+
+import http_pool
+from lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+Image = lazy_import('PIL.Image')
+
+COVER_SIZE = (500, 500)
+COVER_QUALITY = 85
+# (connect, read) timeout of a thumbnail request
+FETCH_TIMEOUT = (5, 15)
+
+
+def fetch_cover(url, max_size=COVER_SIZE):
+    """
+    Download a thumbnail and return it as JPEG bytes of at most max_size.
+
+    :return: JPEG data, or None if the image could not be fetched.
+    """
+    response = http_pool.get(url, timeout=FETCH_TIMEOUT)
+    if response.status_code != 200:
+        logger.warning(f"Thumbnail request failed with HTTP {response.status_code}: {url}")
+        return None
+
+    img = Image.open(io.BytesIO(response.content))
+    if img.format == 'JPEG' and img.width <= max_size[0] and img.height <= max_size[1]:
+        # Already small enough, embed the original bytes without re-encoding
+        return response.content
+
+    # For JPEG sources let the decoder scale down by a power of two while decoding
+    img.draft('RGB', max_size)
+    img.thumbnail(max_size)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=COVER_QUALITY)
+    return buffer.getvalue()
@@ -0,0 +1,255 @@
+"""
+FFmpeg transcoding helpers used once yt-dlp has fetched the source audio.
+"""
+import logging
+import os
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# LAME speed profiles (the "Conversion Speed" setting):
+# - compression_level: LAME algorithm quality, 0 = best and slowest, 9 = fastest
+# - vbr: encode with -q:a from VBR_QUALITY instead of a constant bitrate
+# - sample_rate: resample to this rate, None keeps the source rate (no resampler run)
+SPEED_PROFILES = {
+    'fast': {'compression_level': 7, 'vbr': False, 'sample_rate': None},
+    'balanced': {'compression_level': 5, 'vbr': False, 'sample_rate': None},
+    'quality': {'compression_level': 2, 'vbr': True, 'sample_rate': 44100},
+}
+DEFAULT_PROFILE = 'balanced'
+# LAME VBR level per bitrate setting; V5 averages ~130, V2 ~190, V0 ~245 kbit/s
+VBR_QUALITY = {'128': 5, '192': 2, '320': 0}
+
+
+def lame_options(quality="192", profile=DEFAULT_PROFILE):
+    """
+    FFmpeg output options of a speed profile for libmp3lame, without the codec.
+
+    :param quality: Bitrate in kbps.
+    :param profile: Key of SPEED_PROFILES.
+    """
+    settings = SPEED_PROFILES[profile]
+    quality = str(quality)
+    if settings['vbr']:
+        options = ["-q:a", str(VBR_QUALITY.get(quality, 2))]
+    else:
+        options = ["-b:a", f"{quality}k"]
+    options += ["-compression_level", str(settings['compression_level'])]
+    if settings['sample_rate']:
+        options += ["-ar", str(settings['sample_rate'])]
+    return options
+
+
+def encoder_settings(profile=DEFAULT_PROFILE):
+    """Identifies the encoder settings of a profile in output cache keys"""
+    settings = SPEED_PROFILES[profile]
+    return (f"libmp3lame-{'vbr' if settings['vbr'] else 'cbr'}-q{settings['compression_level']}"
+            f"-{settings['sample_rate'] or 'src'}")
+
+
+# 'mp3' converts to MP3 (stream copy if the source already matches), 'original'
+# keeps the downloaded codec and only remuxes it into an audio container
+OUTPUT_FORMATS = ('mp3', 'original')
+# Audio container of the original-codec mode per source codec
+ORIGINAL_CONTAINERS = {'mp3': 'mp3', 'opus': 'opus', 'vorbis': 'ogg', 'aac': 'm4a', 'flac': 'flac'}
+# Relative bitrate difference an MP3 source may have and still be copied
+BITRATE_TOLERANCE = 0.05
+
+
+def source_codec(info):
+    """Audio codec of the downloaded format, e.g. 'opus' or 'aac', or None"""
+    acodec = (info.get('acodec') or '').lower()
+    if acodec in ('', 'none'):
+        # Some extractors only know the extension
+        acodec = {'mp3': 'mp3', 'm4a': 'aac', 'opus': 'opus', 'ogg': 'vorbis', 'flac': 'flac'}.get(info.get('ext'), '')
+    # Strip the profile, mp4a.40.2 is AAC-LC
+    codec = acodec.split('.')[0]
+    return 'aac' if codec == 'mp4a' else codec or None
+
+
+def plan_transcode(info, quality="192", output_format='mp3'):
+    """
+    Decide how a downloaded format becomes the output file.
+
+    An MP3 source within BITRATE_TOLERANCE of the requested bitrate is copied
+    instead of decoded and encoded again. In 'original' mode every codec of
+    ORIGINAL_CONTAINERS is copied; other codecs still become MP3.
+
+    :param info: Info dict of the downloaded format (acodec, abr, ext).
+    :param quality: Requested bitrate in kbps.
+    :param output_format: One of OUTPUT_FORMATS.
+    :return: Tuple (action, extension), action is 'copy' or 'encode'.
+    """
+    codec = source_codec(info)
+    if output_format == 'original' and codec in ORIGINAL_CONTAINERS:
+        return 'copy', ORIGINAL_CONTAINERS[codec]
+    abr = info.get('abr')
+    if codec == 'mp3' and abr and abs(abr - int(quality)) <= int(quality) * BITRATE_TOLERANCE:
+        return 'copy', 'mp3'
+    return 'encode', 'mp3'
+
+
+# Seconds between two cancellation checks while FFmpeg runs
+CANCEL_POLL_INTERVAL = 0.2
+# Seconds FFmpeg gets to exit after SIGTERM before it is killed
+TERMINATE_TIMEOUT = 2
+
+
+class TranscodeError(Exception):
+    """Raised when FFmpeg fails to convert a file"""
+
+
+class TranscodeCancelled(TranscodeError):
+    """Raised when a transcode was cancelled and FFmpeg has been stopped"""
+
+
+def find_ffmpeg():
+    """Return the path of the ffmpeg binary or raise TranscodeError"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise TranscodeError("ffmpeg not found. Please install FFmpeg and add it to your PATH.")
+    return ffmpeg
+
+
+def mp3_path_for(source_path):
+    """Return the MP3 filename that belongs to a downloaded source file"""
+    return os.path.splitext(source_path)[0] + ".mp3"
+
+
+def transcode_to_mp3(source_path, quality="192", target_path=None, keep_source=False, tags=None, cover=None,
+                     cancel_event=None, profile=DEFAULT_PROFILE, copy=False):
+    """
+    Converts a downloaded audio/video file to MP3 with libmp3lame.
+
+    With tags and/or cover the ID3 tag is written by FFmpeg during the
+    conversion, so the MP3 is written exactly once and no mutagen pass is needed.
+    With copy the MP3 stream of the source is remuxed without re-encoding.
+
+    :param source_path: File downloaded by yt-dlp.
+    :param quality: Bitrate in kbps.
+    :param target_path: Output file, defaults to the source name with .mp3 extension.
+    :param keep_source: Keep the source file after a successful conversion.
+    :param tags: Optional dict of ID3 text tags (artist, album, title).
+    :param cover: Optional JPEG data embedded as front cover.
+    :param cancel_event: Optional threading.Event (or CancelToken); once set, FFmpeg
+        is terminated within CANCEL_POLL_INTERVAL + TERMINATE_TIMEOUT seconds.
+    :param profile: Speed profile, a key of SPEED_PROFILES.
+    :param copy: Copy the audio stream, see plan_transcode.
+    :return: Path of the MP3 file.
+    :raises TranscodeCancelled: If cancel_event was set; the partial output is removed.
+    """
+    target_path = target_path or mp3_path_for(source_path)
+    if copy and not (tags or cover) and _same_file(source_path, target_path):
+        # Already an MP3 at the right bitrate, nothing to rewrite
+        return target_path
+    cmd = [find_ffmpeg(), "-y", "-loglevel", "error", "-i", source_path]
+    if cover:
+        # The cover arrives on stdin, no temporary image file
+        cmd += ["-f", "image2pipe", "-i", "pipe:0", "-map", "0:a:0", "-map", "1:v:0",
+                "-c:v", "copy", "-disposition:v", "attached_pic",
+                "-metadata:s:v", "title=Cover", "-metadata:s:v", "comment=Cover (front)"]
+    else:
+        cmd += ["-vn"]
+    cmd += ["-codec:a", "copy"] if copy else ["-codec:a", "libmp3lame"] + lame_options(quality, profile)
+    if tags or cover:
+        cmd += ["-map_metadata", "-1", "-id3v2_version", "3", "-write_id3v1", "0"]
+        for key, value in (tags or {}).items():
+            cmd += ["-metadata", f"{key}={value}"]
+
+    logger.info(f"{'Copying' if copy else 'Transcoding'} {source_path} -> {target_path}")
+    return _run_to_target(cmd, source_path, target_path, keep_source, cover, cancel_event)
+
+
+def remux_audio(source_path, extension, target_path=None, keep_source=False, cancel_event=None):
+    """
+    Copies the audio stream of a downloaded file into an audio container without re-encoding.
+
+    Used by the original-codec mode. Tags and cover are written afterwards with
+    tagging.write_tags, FFmpeg cannot embed a cover in every container.
+
+    :param source_path: File downloaded by yt-dlp.
+    :param extension: Target container, a value of ORIGINAL_CONTAINERS.
+    :param target_path: Output file, defaults to the source name with the new extension.
+    :param keep_source: Keep the source file after a successful remux.
+    :param cancel_event: See transcode_to_mp3.
+    :return: Path of the new file.
+    :raises TranscodeCancelled: If cancel_event was set; the partial output is removed.
+    """
+    target_path = target_path or os.path.splitext(source_path)[0] + "." + extension
+    if _same_file(source_path, target_path):
+        # Already in its audio container
+        return target_path
+    cmd = [find_ffmpeg(), "-y", "-loglevel", "error", "-i", source_path, "-map", "0:a:0", "-codec:a", "copy"]
+    if extension == "m4a":
+        cmd += ["-movflags", "+faststart"]
+
+    logger.info(f"Remuxing {source_path} -> {target_path}")
+    return _run_to_target(cmd, source_path, target_path, keep_source, None, cancel_event)
+
+
+def _same_file(source_path, target_path):
+    return os.path.abspath(source_path) == os.path.abspath(target_path)
+
+
+def _run_to_target(cmd, source_path, target_path, keep_source, stdin_data, cancel_event):
+    """Run an FFmpeg command that still lacks its output file and move the result to target_path"""
+    # Never let FFmpeg read and write the same file
+    if _same_file(source_path, target_path):
+        base, ext = os.path.splitext(target_path)
+        temp_path = f"{base}.part{ext}"
+    else:
+        temp_path = target_path
+    cmd = cmd + [temp_path]
+
+    returncode, stderr = _run_ffmpeg(cmd, stdin_data, cancel_event)
+    if returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if returncode is None:
+            raise TranscodeCancelled(f"Conversion of {source_path} cancelled")
+        stderr = stderr.decode("utf-8", errors="replace").strip()
+        raise TranscodeError(f"Audio conversion failed: {stderr}")
+
+    if temp_path != target_path:
+        os.replace(temp_path, target_path)
+    elif not keep_source:
+        os.remove(source_path)
+    return target_path
+
+
+def _run_ffmpeg(cmd, stdin_data=None, cancel_event=None):
+    """
+    Run FFmpeg, stopping it if cancel_event gets set.
+
+    :return: (returncode, stderr), returncode is None if it was cancelled.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return None, b""
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE if stdin_data else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    timeout = CANCEL_POLL_INTERVAL if cancel_event is not None else None
+    while True:
+        try:
+            # Input is only written on the first call, retries just keep reading
+            _, stderr = process.communicate(stdin_data, timeout=timeout)
+            return process.returncode, stderr
+        except subprocess.TimeoutExpired:
+            if not cancel_event.is_set():
+                continue
+        process.terminate()
+        try:
+            process.communicate(timeout=TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+        logger.info("FFmpeg stopped on cancellation")
+        return None, b""
+
+
+def downloaded_filepath(ydl, info):
+    """Return the path of the file yt-dlp actually wrote for an info dict"""
+    for download in info.get("requested_downloads") or []:
+        if download.get("filepath"):
+            return download["filepath"]
+    return info.get("filepath") or ydl.prepare_filename(info)
@@ -0,0 +1,153 @@
+"""
+Pool of warm YoutubeDL instances.
+
+Constructing a YoutubeDL sets up the extractor list, post-processors, the
+cookie jar and the HTTP request handlers. Strategy attempts, format checks and
+playlist entries used to pay for that on every call. The pool keeps idle
+instances per option profile, i.e. all options except the ones that change
+per call (output template, format, progress hooks, noplaylist). On checkout
+those are applied to the idle instance; the caller has it to itself until it
+is returned. A 'cookiefile' option is not loaded by YoutubeDL itself: all
+instances share the jar from cookie_jars, which follows changes of the file.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import cookie_jars
+from lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+yt_dlp = lazy_import('yt_dlp')
+
+# Options applied per checkout instead of being part of the profile
+PER_CALL_OPTIONS = ('outtmpl', 'format', 'progress_hooks', 'noplaylist')
+
+
+def profile_key(ydl_opts):
+    """Stable key of the options that are fixed when a YoutubeDL is constructed"""
+    profile = {key: value for key, value in ydl_opts.items() if key not in PER_CALL_OPTIONS}
+    return json.dumps(profile, sort_keys=True, default=repr)
+
+
+class YoutubeDLPool:
+    """
+    Idle YoutubeDL instances by option profile.
+
+    :param max_idle: Idle instances kept per profile.
+    :param max_profiles: Profiles kept; the least recently used one is closed first.
+    """
+
+    def __init__(self, max_idle=4, max_profiles=16):
+        self.max_idle = max_idle
+        self.max_profiles = max_profiles
+        self._idle = OrderedDict()  # profile key -> list of YoutubeDL
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'create_seconds': 0.0, 'reuse_seconds': 0.0}
+
+    @contextmanager
+    def checkout(self, ydl_opts):
+        """Context manager yielding a YoutubeDL configured with ydl_opts"""
+        key = profile_key(ydl_opts)
+        ydl = self._acquire(key, ydl_opts)
+        try:
+            yield ydl
+        finally:
+            self._release(key, ydl)
+
+    def _acquire(self, key, ydl_opts):
+        started = time.perf_counter()
+        # Checked on every checkout, so an edited cookie file is picked up
+        jar = cookie_jars.get_jar(ydl_opts['cookiefile']) if ydl_opts.get('cookiefile') else None
+        with self._lock:
+            instances = self._idle.get(key)
+            ydl = instances.pop() if instances else None
+            if instances is not None:
+                self._idle.move_to_end(key)
+        if ydl is None:
+            # YoutubeDL fills its defaults into the dict it gets, keep the caller's options intact.
+            # The hooks are not passed either, params would keep the first job's closures alive
+            ydl = yt_dlp.YoutubeDL({key: value for key, value in ydl_opts.items()
+                                    if key not in ('cookiefile', 'progress_hooks')})
+            ydl._progress_hooks = list(ydl_opts.get('progress_hooks', []))
+            if jar is not None:
+                # Replaces the cached_property, so YoutubeDL never parses or saves the file itself
+                ydl.__dict__['cookiejar'] = jar
+            self._record('created', started)
+            return ydl
+        self._configure(ydl, ydl_opts)
+        self._record('reused', started)
+        return ydl
+
+    @staticmethod
+    def _configure(ydl, ydl_opts):
+        """Apply the per-call options to a pooled instance"""
+        outtmpl = ydl_opts.get('outtmpl', {})
+        ydl.params['outtmpl'] = dict(outtmpl) if isinstance(outtmpl, dict) else outtmpl
+        ydl._parse_outtmpl()
+        ydl.params['noplaylist'] = ydl_opts.get('noplaylist', False)
+        format_spec = ydl_opts.get('format')
+        if format_spec != ydl.params.get('format'):
+            ydl.params['format'] = format_spec
+            ydl.format_selector = (format_spec if format_spec in (None, '-') or callable(format_spec)
+                                   else ydl.build_format_selector(format_spec))
+        ydl._progress_hooks = list(ydl_opts.get('progress_hooks', []))
+
+    def _release(self, key, ydl):
+        # Drop the hooks so finished jobs are not kept alive, and forget earlier errors
+        ydl._progress_hooks = []
+        ydl._download_retcode = 0
+        evicted = []
+        with self._lock:
+            instances = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(instances) < self.max_idle:
+                instances.append(ydl)
+            else:
+                evicted.append(ydl)
+            while len(self._idle) > self.max_profiles:
+                _, old = self._idle.popitem(last=False)
+                evicted.extend(old)
+        for instance in evicted:
+            self._close(instance)
+
+    def _record(self, kind, started):
+        with self._lock:
+            self._stats[kind] += 1
+            self._stats[f"{'create' if kind == 'created' else 'reuse'}_seconds"] += time.perf_counter() - started
+
+    @staticmethod
+    def _close(ydl):
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning(f"Closing YoutubeDL failed: {e}")
+
+    def close(self):
+        """Close all idle instances"""
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for instances in idle.values():
+            for ydl in instances:
+                self._close(ydl)
+
+    def stats(self):
+        """Created and reused instances and the average setup time of each in ms"""
+        with self._lock:
+            stats = dict(self._stats)
+            idle = sum(len(instances) for instances in self._idle.values())
+        return {
+            'created': stats['created'],
+            'reused': stats['reused'],
+            'idle': idle,
+            'avg_create_ms': round(stats['create_seconds'] * 1000 / stats['created'], 2) if stats['created'] else None,
+            'avg_reuse_ms': round(stats['reuse_seconds'] * 1000 / stats['reused'], 2) if stats['reused'] else None,
+        }
+
+
+# Pool shared by the GUI, the server and the CLI
+shared_pool = YoutubeDLPool()